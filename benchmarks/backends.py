@@ -0,0 +1,75 @@
+"""
+Side by side timing of the walker's scan backends, on the same file.
+Also checks they come up with the same nodes and edges.
+
+    python benchmarks/backends.py -i shot.usda -n 5 -t
+"""
+from __future__ import print_function
+import argparse
+import logging
+import os.path
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from usd_noodle.walker import DependencyWalker, logger
+from usd_noodle.stat_cache import StatCache
+
+
+def records(walker):
+    """
+    What the graph boils down to, for comparing walks
+    """
+    nodes = sorted((path, info.get('type'), info.get('online')) for path, info in walker.nodes.items())
+    edges = sorted(tuple(x) for x in walker.edges)
+    return nodes, edges
+
+
+def run(usdfile, backend, walk_attributes):
+    # fresh caches, so every run does the same work
+    walker = DependencyWalker(usdfile, stat_cache=StatCache())
+    walker.backend = backend
+    walker.walk_attributes = walk_attributes
+    start = time.time()
+    walker.start()
+    return time.time() - start, walker
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--usdfile', required=True, help='usd file to walk')
+    parser.add_argument('-n', '--runs', type=int, default=5, help='runs per backend')
+    parser.add_argument('-t', '--textures', action='store_true', help="Walk attributes too")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+
+    results = {}
+    for backend in DependencyWalker.backends:
+        times = []
+        for i in range(args.runs):
+            elapsed, walker = run(args.usdfile, backend, args.textures)
+            times.append(elapsed)
+        results[backend] = (times, records(walker))
+        print('{:<8} best {:.4f}s  mean {:.4f}s  {} nodes  {} edges'.format(
+            backend, min(times), sum(times) / len(times), len(walker.nodes), len(walker.edges)))
+
+    base = DependencyWalker.backends[0]
+    base_nodes, base_edges = results[base][1]
+    for backend in DependencyWalker.backends[1:]:
+        nodes, edges = results[backend][1]
+        speedup = min(results[base][0]) / max(min(results[backend][0]), 1e-9)
+        print('{} vs {}: {:.2f}x'.format(backend, base, speedup))
+        if nodes == base_nodes and edges == base_edges:
+            print('  same nodes and edges')
+            continue
+        for label, ours, theirs in [('nodes', nodes, base_nodes), ('edges', edges, base_edges)]:
+            for x in sorted(set(ours) - set(theirs)):
+                print('  extra {}: {}'.format(label, x))
+            for x in sorted(set(theirs) - set(ours)):
+                print('  missing {}: {}'.format(label, x))
+
+
+if __name__ == '__main__':
+    main()
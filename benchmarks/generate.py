@@ -0,0 +1,195 @@
+"""
+Writes a synthetic usd closure to benchmark against.
+
+A root layer references fanout layers, each of those references fanout more,
+down to depth levels. shared is the chance a reference points at a layer
+that's already been written at that level, rather than a new one,
+so the graph turns into the diamonds real asset libraries make.
+Every layer can also get variant sets, value clips and textures.
+
+    python benchmarks/generate.py -o /tmp/bench --depth 4 --fanout 5 --shared 0.3 --variants 1 --clips 1 --textures 4
+"""
+from __future__ import print_function
+import argparse
+import os
+import random
+
+
+# frames per value clip
+clip_frames = 3
+
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def reference_prim(name, asset_path):
+    return ('def Xform "{}" (\n'
+            '    references = @{}@\n'
+            ')\n'
+            '{{\n'
+            '}}\n').format(name, asset_path)
+
+
+def variant_prim(index, children):
+    """
+    A prim with a variant set, a variant per child layer
+    """
+    lines = ['def Xform "variants_{}" (\n'.format(index),
+             '    variantSets = "set{}"\n'.format(index),
+             '    variants = {{ string set{} = "v0" }}\n'.format(index),
+             ')\n',
+             '{\n',
+             '    variantSet "set{}" = {{\n'.format(index)]
+    for i, child in enumerate(children):
+        lines.append('        "v{}" (\n'.format(i))
+        lines.append('            references = @{}@\n'.format(child))
+        lines.append('        ) {\n')
+        lines.append('        }\n')
+    lines.append('    }\n')
+    lines.append('}\n')
+    return ''.join(lines)
+
+
+def clip_prim(index, clip_paths):
+    assets = ', '.join('@{}@'.format(x) for x in clip_paths)
+    active = ', '.join('({}, {})'.format(i + 1, i) for i in range(len(clip_paths)))
+    times = ', '.join('({0}, {0})'.format(i + 1) for i in range(len(clip_paths)))
+    return ('def Xform "clipped_{0}" (\n'
+            '    clips = {{\n'
+            '        dictionary default = {{\n'
+            '            double2[] active = [{2}]\n'
+            '            asset[] assetPaths = [{1}]\n'
+            '            string primPath = "/asset/clipped_{0}"\n'
+            '            double2[] times = [{3}]\n'
+            '        }}\n'
+            '    }}\n'
+            ')\n'
+            '{{\n'
+            '}}\n').format(index, assets, active, times)
+
+
+def texture_prim(texture_paths):
+    lines = ['def Scope "textures"\n', '{\n']
+    for i, texture in enumerate(texture_paths):
+        lines.append('    def Shader "tex_{}"\n'.format(i))
+        lines.append('    {\n')
+        lines.append('        uniform token info:id = "UsdUVTexture"\n')
+        lines.append('        asset inputs:file = @{}@\n'.format(texture))
+        lines.append('    }\n')
+    lines.append('}\n')
+    return ''.join(lines)
+
+
+def generate(out_dir, depth=3, fanout=4, shared=0.25, variants=0, clips=0, textures=0, seed=1):
+    """
+    Write the closure
+    :param depth: levels of references below the root
+    :param fanout: references per layer
+    :param shared: 0-1 chance a reference goes to a layer that's already been written
+    :param variants: variant sets per layer, each with a variant per child layer
+    :param clips: value clip sets per layer, of clip_frames clip layers each
+    :param textures: textures per layer
+    :param seed: same seed, same files
+    :return: (root file path, stats dict of how many of each file were written)
+    """
+    rng = random.Random(seed)
+    for sub in ['layers', 'clips', 'textures']:
+        if not os.path.isdir(os.path.join(out_dir, sub)):
+            os.makedirs(os.path.join(out_dir, sub))
+
+    stats = {'layers': 0, 'references': 0, 'variants': 0, 'clips': 0, 'textures': 0}
+    # layers written so far at each level, to pick shared ones from
+    levels = [[] for x in range(depth + 1)]
+
+    def new_layer(level):
+        name = 'l{}_{:05d}'.format(level, len(levels[level]))
+        levels[level].append(name)
+        return name
+
+    def pick_child(level):
+        if levels[level] and rng.random() < shared:
+            return rng.choice(levels[level]), False
+        return new_layer(level), True
+
+    # (layer name, level, file it's written to)
+    to_write = [('root', 0, os.path.join(out_dir, 'root.usda'))]
+    while to_write:
+        name, level, path = to_write.pop()
+        # the root lives a directory up from the rest
+        prefix = './layers/' if name == 'root' else './'
+        up = './' if name == 'root' else '../'
+        body = []
+
+        if level < depth:
+            children = []
+            for i in range(fanout + variants):
+                child, is_new = pick_child(level + 1)
+                children.append(child)
+                if is_new:
+                    to_write.append((child, level + 1, os.path.join(out_dir, 'layers', child + '.usda')))
+            for i, child in enumerate(children[:fanout]):
+                body.append(reference_prim('ref_{}'.format(i), '{}{}.usda'.format(prefix, child)))
+                stats['references'] += 1
+            for i in range(variants):
+                # each set switches between its own child and the first of the plain references
+                picks = [children[fanout + i]] + children[:1]
+                body.append(variant_prim(i, ['{}{}.usda'.format(prefix, x) for x in picks]))
+                stats['variants'] += 1
+
+        for i in range(clips):
+            clip_paths = []
+            for frame in range(clip_frames):
+                clip_name = '{}_c{}.{:04d}.usda'.format(name, i, frame + 1)
+                write(os.path.join(out_dir, 'clips', clip_name), '#usda 1.0\n')
+                clip_paths.append('{}clips/{}'.format(up, clip_name))
+                stats['clips'] += 1
+            body.append(clip_prim(i, clip_paths))
+
+        if textures:
+            texture_paths = []
+            for i in range(textures):
+                texture_name = '{}_t{}.png'.format(name, i)
+                write(os.path.join(out_dir, 'textures', texture_name), '')
+                texture_paths.append('{}textures/{}'.format(up, texture_name))
+                stats['textures'] += 1
+            body.append(texture_prim(texture_paths))
+
+        # everything goes under a default prim, so the references compose
+        body = ''.join('    ' + x if x.strip() else x for x in '\n'.join(body).splitlines(True))
+        write(path, '#usda 1.0\n(\n    defaultPrim = "asset"\n)\n\ndef Xform "asset"\n{{\n{}}}\n'.format(body))
+        stats['layers'] += 1
+
+    return os.path.join(out_dir, 'root.usda'), stats
+
+
+def add_arguments(parser):
+    parser.add_argument('--depth', type=int, default=3, help='levels of references below the root')
+    parser.add_argument('--fanout', type=int, default=4, help='references per layer')
+    parser.add_argument('--shared', type=float, default=0.25,
+                        help='chance a reference goes to a layer that has already been written, 0-1')
+    parser.add_argument('--variants', type=int, default=0, help='variant sets per layer')
+    parser.add_argument('--clips', type=int, default=0, help='value clip sets per layer')
+    parser.add_argument('--textures', type=int, default=0, help='textures per layer')
+    parser.add_argument('--seed', type=int, default=1, help='same seed, same files')
+
+
+def generator_settings(args):
+    return {'depth': args.depth, 'fanout': args.fanout, 'shared': args.shared, 'variants': args.variants,
+            'clips': args.clips, 'textures': args.textures, 'seed': args.seed}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--output', required=True, help='directory to write to')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    root, stats = generate(args.output, **generator_settings(args))
+    print(root)
+    print(', '.join('{} {}'.format(stats[x], x) for x in sorted(stats)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""
+Times the walker and the ui on a synthetic closure from generate.py,
+and keeps the results per commit so they can be compared.
+
+Scenarios:
+    walk    DependencyWalker.start, with fresh caches each run
+    load    NoodleWidget.load_file, building the graph and laying it out
+    layout  NoodleWidget.layout_nodes on the loaded graph
+    find    the Find window's search over the loaded graph
+
+The ui scenarios run on Qt's offscreen platform, and are skipped if there's no Qt to run them on.
+Results go to benchmarks/results/<git rev>.json, one entry per set of generator settings.
+
+    python benchmarks/suite.py --depth 4 --fanout 5 --textures 2 -n 5
+    python benchmarks/suite.py --depth 4 --fanout 5 --textures 2 -n 5 --compare 1a2b3c4
+"""
+from __future__ import print_function
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..'))
+sys.path.insert(0, here)
+
+from usd_noodle.walker import DependencyWalker, logger
+from usd_noodle.stat_cache import StatCache
+import generate
+
+scenarios = ['walk', 'load', 'layout', 'find']
+results_dir = os.path.join(here, 'results')
+
+
+def git_rev():
+    """
+    :return: short hash of the commit being benchmarked, with -dirty on the end if there are changes
+    """
+    def git(*args):
+        return subprocess.check_output(('git',) + args, cwd=here).decode().strip()
+    try:
+        rev = git('rev-parse', '--short', 'HEAD')
+        if git('status', '--porcelain', '--untracked-files=no'):
+            rev += '-dirty'
+        return rev
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def settings_key(settings):
+    return ','.join('{}={}'.format(x, settings[x]) for x in sorted(settings))
+
+
+def timed(runs, setup, func):
+    """
+    :param setup: called before each run, untimed. its return value is passed to func
+    :return: list of run times
+    """
+    times = []
+    for i in range(runs):
+        arg = setup()
+        start = time.time()
+        func(arg)
+        times.append(time.time() - start)
+    return times
+
+
+def walk_scenario(usdfile, runs, args):
+    walkers = []
+
+    def setup():
+        # fresh caches, so every run does the same work
+        walker = DependencyWalker(usdfile, stat_cache=StatCache())
+        walker.walk_attributes = args.walk_attributes
+        walker.workers = args.workers
+        walker.backend = args.backend
+        walkers.append(walker)
+        return walker
+
+    times = timed(runs, setup, lambda walker: walker.start())
+    walker = walkers[-1]
+    return {'walk': times}, {'nodes': len(walker.nodes), 'edges': len(walker.edges)}
+
+
+def ui_scenarios(usdfile, runs, args):
+    """
+    load, layout and find, on the one widget
+    :return: times dict, or None if there's no Qt
+    """
+    try:
+        from Qt import QtWidgets
+        from usd_noodle.app import NoodleWidget, FindNodeWindow
+    except ImportError as e:
+        print('skipping ui scenarios, no Qt: {}'.format(e))
+        return None
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    widget = NoodleWidget(walk_attributes=args.walk_attributes, workers=args.workers, use_cache=False,
+                          backend=args.backend)
+    # walk on this thread, so the load is done when load_file returns
+    widget.background = False
+    # every load starts from scratch
+    widget.incremental_reload = False
+    widget.usdfile = usdfile
+
+    def load(arg):
+        widget.load_file()
+        app.processEvents()
+
+    times = {}
+    times['load'] = timed(runs, lambda: widget.info_panel.stat_cache.clear(), load)
+    times['layout'] = timed(runs, lambda: None, lambda arg: widget.layout_nodes())
+
+    find_win = FindNodeWindow(widget.nodz)
+    # the search gets run by hand, not as the text is typed
+    find_win.searchTxt.blockSignals(True)
+    find_win.searchTxt.setText(args.find)
+    times['find'] = timed(runs, lambda: None, lambda arg: find_win.search())
+    find_win.close()
+
+    widget.close()
+    app.processEvents()
+    return times
+
+
+def summarize(times):
+    return {'best': min(times), 'mean': sum(times) / len(times), 'runs': times}
+
+
+def load_results(rev):
+    path = os.path.join(results_dir, '{}.json'.format(rev))
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(rev, key, entry):
+    if not os.path.isdir(results_dir):
+        os.makedirs(results_dir)
+    results = load_results(rev)
+    results[key] = entry
+    with open(os.path.join(results_dir, '{}.json'.format(rev)), 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def compare(entry, old_entry, old_rev):
+    print('against {}:'.format(old_rev))
+    for name in scenarios:
+        if name not in entry['scenarios'] or name not in old_entry['scenarios']:
+            continue
+        new = entry['scenarios'][name]['best']
+        old = old_entry['scenarios'][name]['best']
+        change = (new - old) / old * 100 if old else 0.0
+        print('  {:<8} {:.4f}s -> {:.4f}s  {:+.1f}%'.format(name, old, new, change))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    generate.add_arguments(parser)
+    parser.add_argument('-n', '--runs', type=int, default=5, help='runs per scenario')
+    parser.add_argument('-s', '--scenario', action='append', choices=scenarios,
+                        help='scenarios to run, all of them if not given')
+    parser.add_argument('-t', '--walk-attributes', action='store_true', help='walk attributes, ie textures')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='walker threads')
+    parser.add_argument('--backend', default='python', choices=DependencyWalker.backends)
+    parser.add_argument('--find', default='l2_', help='text the find scenario searches for')
+    parser.add_argument('--dir', help='write the closure here and keep it, rather than in a temp dir')
+    parser.add_argument('--compare', metavar='REV', help='compare against the results saved for this commit')
+    parser.add_argument('--no-save', action='store_true', help="don't save the results")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    wanted = args.scenario or scenarios
+    settings = generate.generator_settings(args)
+    run_settings = dict(settings, walk_attributes=args.walk_attributes, workers=args.workers,
+                        backend=args.backend)
+    key = settings_key(run_settings)
+
+    out_dir = args.dir or tempfile.mkdtemp(prefix='noodle_bench_')
+    try:
+        usdfile, stats = generate.generate(out_dir, **settings)
+        print('{}: {}'.format(usdfile, ', '.join('{} {}'.format(stats[x], x) for x in sorted(stats))))
+
+        times = {}
+        graph = {}
+        if 'walk' in wanted:
+            walk_times, graph = walk_scenario(usdfile, args.runs, args)
+            times.update(walk_times)
+        if set(wanted) & set(['load', 'layout', 'find']):
+            ui_times = ui_scenarios(usdfile, args.runs, args)
+            if ui_times:
+                times.update((x, ui_times[x]) for x in ui_times if x in wanted)
+    finally:
+        if not args.dir:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    rev = git_rev()
+    entry = {
+        'rev': rev,
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': run_settings,
+        'files': stats,
+        'graph': graph,
+        'scenarios': dict((x, summarize(times[x])) for x in times),
+    }
+    for name in scenarios:
+        if name in entry['scenarios']:
+            result = entry['scenarios'][name]
+            print('{:<8} best {:.4f}s  mean {:.4f}s'.format(name, result['best'], result['mean']))
+
+    if not args.no_save:
+        save_results(rev, key, entry)
+        print('saved to {}'.format(os.path.join(results_dir, '{}.json'.format(rev))))
+
+    if args.compare:
+        old_entry = load_results(args.compare).get(key)
+        if old_entry is None:
+            print('no results for {} with these settings'.format(args.compare))
+        else:
+            compare(entry, old_entry, args.compare)
+
+
+if __name__ == '__main__':
+    main()
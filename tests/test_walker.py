@@ -0,0 +1,86 @@
+"""
+Walks small layer stacks written out to a temp dir, and checks the graph that comes back
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from usd_noodle import headless
+from usd_noodle.walker import DependencyWalker
+from usd_noodle.scope import ScopeRules
+
+
+class WalkerTest(unittest.TestCase):
+    
+    
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='noodle_test_')
+    
+    
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+    
+    
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+    
+    
+    def test_broken_sublayer_found_as_attribute_first(self):
+        # bad.usda is found as an asset attribute in a.usda and let go of,
+        # then reached again as a sublayer of b.usda, which fails to open
+        root = self.write('root.usda', '#usda 1.0\n(\n    subLayers = [@./a.usda@, @./b.usda@]\n)\n')
+        self.write('a.usda', '#usda 1.0\ndef "x"\n{\n    asset f = @./bad.usda@\n}\n')
+        self.write('b.usda', '#usda 1.0\n(\n    subLayers = [@./bad.usda@]\n)\n')
+        self.write('bad.usda', '#usda 1.0\nthis is not usd\n')
+        
+        report = headless.walk(root, walk_attributes=True, use_cache=False)
+        self.assertEqual(report['layers'], 4)
+        self.assertTrue(any(x.endswith('bad.usda') for x in report['errors']))
+    
+    
+    
+    def test_native_keeps_reference_also_used_as_attribute(self):
+        root = self.write('root.usda', '#usda 1.0\ndef "a" (\n    references = @./dep.usda@\n)\n{\n}\n'
+                                       'def "b"\n{\n    asset proxyFile = @./dep.usda@\n}\n')
+        self.write('dep.usda', '#usda 1.0\n')
+        
+        for walk_attributes in [False, True]:
+            edges = {}
+            for backend in DependencyWalker.backends:
+                x = DependencyWalker(root)
+                x.backend = backend
+                x.walk_attributes = walk_attributes
+                x.start()
+                edges[backend] = sorted(tuple(e) for e in x.edges)
+            self.assertIn((root, os.path.join(self.dir, 'dep.usda'), 'reference'), edges['native'])
+            self.assertEqual(edges['native'], edges['python'])
+    
+    
+    
+    def test_excluded_types_leave_no_orphans(self):
+        root = self.write('root.usda', '#usda 1.0\n'
+                                       'def Material "mat"\n{\n    def Shader "tex"\n    {\n'
+                                       '        asset inputs:file = @./diffuse.png@\n    }\n}\n'
+                                       'def "x" (\n    variantSets = "v"\n    variants = {\n        string v = "a"\n    }\n)\n'
+                                       '{\n    variantSet "v" = {\n        "a" (\n            references = @./a.usda@\n'
+                                       '        ) {\n        }\n    }\n}\n')
+        self.write('a.usda', '#usda 1.0\n')
+        self.write('diffuse.png', '')
+        
+        for excluded, gone in [('material', 'diffuse.png'), ('variant', 'a.usda')]:
+            x = DependencyWalker(root)
+            x.walk_attributes = True
+            x.scope = ScopeRules(exclude_types=[excluded])
+            x.start()
+            self.assertNotIn(os.path.join(self.dir, gone), x.nodes)
+            # every node but the root is at the end of an edge
+            ends = set(e[1] for e in x.edges)
+            self.assertEqual(set(x.nodes) - set([x.usdfile]), ends & set(x.nodes))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,27 @@ import os.path
 
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "vendor"))
-from Qt import QtWidgets, QtGui, QtCore
-from .app import *
 
+# the ui (and Qt, and Nodz) only gets imported the first time something from it is asked for,
+# so the walker can be used headless without paying for any of it
+if sys.version_info >= (3, 7):
+    # submodules get imported the usual way, everything else is looked for in app
+    _submodules = set(os.path.splitext(x)[0] for x in os.listdir(os.path.dirname(__file__)))
+    
+    
+    def __getattr__(name):
+        if name.startswith('__') or name in _submodules:
+            raise AttributeError("module 'usd_noodle' has no attribute '{}'".format(name))
+        from . import app
+        try:
+            return getattr(app, name)
+        except AttributeError:
+            raise AttributeError("module 'usd_noodle' has no attribute '{}'".format(name))
+    
+    
+    def __dir__():
+        from . import app
+        return sorted(set(globals()) | set(x for x in dir(app) if not x.startswith('_')))
+else:
+    from Qt import QtWidgets, QtGui, QtCore
+    from .app import *
@@ -1,12 +1,13 @@
 import argparse
 import sys
-import sys
 import os.path
 
-sys.path.append(os.path.join(os.path.dirname(__file__), "vendor"))
+if not __package__:
+    # run as a script, ie python usd_noodle, rather than python -m usd_noodle
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from Qt import QtWidgets, QtGui, QtCore
-from app import *
+# Qt is only imported once we know there's a window to show, so --headless starts quickly
+from usd_noodle.scope import ScopeRules, WalkBudget
 
 
 def cli():
@@ -15,10 +16,88 @@ def cli():
     
     parser.add_argument('-i', '--usdfile', help='usd file to load')
     parser.add_argument('-t', '--textures', action='store_true', help="Load textures (ie, walk attributes)")
+    parser.add_argument('-w', '--workers', type=int, default=1, help="Number of threads used to scan layers")
+    parser.add_argument('-p', '--processes', type=int, default=0,
+                        help="Number of processes used to scan layers. Overrides --workers")
+    parser.add_argument('--order', default='depth', choices=['depth', 'breadth', 'priority'],
+                        help="Order layers are walked in")
+    parser.add_argument('--no-cache', action='store_true', help="Don't use the on-disk layer cache")
+    parser.add_argument('-d', '--depth', type=int, default=0,
+                        help="Levels of layers to walk up front, the rest are left collapsed. 0 walks everything")
+    parser.add_argument('--backend', default='python', choices=['python', 'native'],
+                        help="How layers are scanned. native finds arcs with UsdUtils in c++")
+    parser.add_argument('--scan', default='full', choices=['full', 'structure', 'stack'],
+                        help="How much of each layer is looked at. structure only finds the layer stack and "
+                             "composition arcs, stack only the layer stack, reading layer metadata and nothing else")
+    parser.add_argument('--include', action='append', metavar='PATTERN',
+                        help="Only walk dependencies with resolved paths matching this glob, or regex with a re: "
+                             "prefix. Can be given more than once")
+    parser.add_argument('--exclude', action='append', metavar='PATTERN',
+                        help="Skip dependencies with resolved paths matching this glob, or regex with a re: "
+                             "prefix. Can be given more than once")
+    parser.add_argument('--include-type', action='append', metavar='TYPE',
+                        help="Only walk dependencies of this type, ie sublayer, reference, payload, clip, tex")
+    parser.add_argument('--exclude-type', action='append', metavar='TYPE', help="Skip dependencies of this type")
+    parser.add_argument('--max-layers', type=int, default=0, help="Stop the walk after this many layers")
+    parser.add_argument('--max-nodes', type=int, default=0, help="Stop the walk after this many nodes")
+    parser.add_argument('--max-seconds', type=float, default=0, help="Stop the walk after this many seconds")
+    parser.add_argument('--layer-memory', type=int, metavar='MB',
+                        help="Megabytes of layers to keep open between loads. 0 closes each layer once it's scanned. "
+                             "Defaults to 0, or 1024 with --batch")
+    parser.add_argument('--headless', action='store_true',
+                        help="Walk the file without a window and report offline files and errors. Never imports Qt")
+    parser.add_argument('-o', '--output', metavar='FILE', help="Headless report file, stdout if not given")
+    parser.add_argument('--format', default='text', choices=['text', 'json'], help="Headless report format")
+    parser.add_argument('--export', metavar='FILE',
+                        help="Write the graph to this file as it's walked, headless. The format goes by the extension, "
+                             ".jsonl, .graphml, .dot or .csv")
+    parser.add_argument('--export-format', choices=['jsonl', 'graphml', 'dot', 'csv'],
+                        help="Format for --export, if the extension doesn't say")
+    parser.add_argument('--batch', action='append', metavar='PATTERN',
+                        help="Walk every root file matching this glob, headless, sharing caches between them. "
+                             "@FILE reads roots from a file, one per line. Can be given more than once")
+    parser.add_argument('-j', '--jobs', type=int, default=4, help="Batch: number of root files walked at once")
+    parser.add_argument('--closures', action='store_true',
+                        help="Batch: list every root's dependencies in the text report. json always has them")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Headless: log the walk as it goes")
     args = parser.parse_args()
-
+    
+    scope = ScopeRules(include=args.include, exclude=args.exclude,
+                       include_types=args.include_type, exclude_types=args.exclude_type)
+    budget = WalkBudget(max_layers=args.max_layers, max_nodes=args.max_nodes, max_seconds=args.max_seconds)
+    
+    if args.batch:
+        if args.export:
+            parser.error("--export takes a single root file, it can't be used with --batch")
+        from usd_noodle import batch
+        roots = args.batch + ([args.usdfile] if args.usdfile else [])
+        layer_memory = 1024 if args.layer_memory is None else args.layer_memory
+        sys.exit(batch.run(roots, output=args.output, as_json=args.format == 'json', verbose=args.verbose,
+                           closures=args.closures, jobs=args.jobs, layer_memory=layer_memory,
+                           walk_attributes=args.textures, workers=args.workers, processes=args.processes,
+                           walk_order=args.order, use_cache=not args.no_cache, backend=args.backend,
+                           scan_mode=args.scan, scope=scope, budget=budget))
+    
+    if args.headless or args.export:
+        if not args.usdfile:
+            parser.error('--headless needs a usd file, -i')
+        from usd_noodle import headless, export
+        if args.export and not (args.export_format or export.guess_format(args.export)):
+            parser.error("can't tell the format of {} from its extension, use --export-format".format(args.export))
+        sys.exit(headless.run(args.usdfile, output=args.output, as_json=args.format == 'json',
+                              verbose=args.verbose, walk_attributes=args.textures, workers=args.workers,
+                              processes=args.processes, walk_order=args.order, use_cache=not args.no_cache,
+                              backend=args.backend, scan_mode=args.scan, scope=scope, budget=budget,
+                              export=args.export, export_format=args.export_format))
+    
+    from Qt import QtWidgets
+    from usd_noodle.app import main
+    
     app = QtWidgets.QApplication(sys.argv)
-    win = main(args.usdfile, walk_attributes=args.textures)
+    win = main(args.usdfile, walk_attributes=args.textures, workers=args.workers, processes=args.processes,
+               walk_order=args.order, use_cache=not args.no_cache, backend=args.backend,
+               scan_mode=args.scan, max_depth=args.depth, scope=scope, budget=budget,
+               layer_memory=args.layer_memory or 0)
     sys.exit(app.exec_())
 
 
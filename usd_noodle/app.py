@@ -1,433 +1,31 @@
 from __future__ import print_function
-import logging
 import os.path
-import sys
-import argparse
 
-import random
 import fnmatch
 from functools import partial
 import subprocess
 import threading
-import sys
 import platform
+import time
 
 from Qt import QtCore, QtWidgets, QtGui
-from pxr import Usd, Sdf, Ar, UsdUtils, Tf
+from pxr import Sdf
 
-from . import utils, text_view, info_panel
+from . import utils, text_view, info_panel, export
+from .walker import DependencyWalker, logger, NODE_FOUND, EDGE_FOUND, LAYER_FINISHED
+from .edge_store import EdgeStore
+from .layer_cache import LayerCache
+from .layer_lru import LayerLRU
+from .stat_cache import get_stat_cache
+from .watcher import GraphWatcher
 from .vendor.Nodz import nodz_main
 
-import re
-from pprint import pprint
-
-
-digitSearch = re.compile(r'\b\d+\b')
-logger = logging.getLogger('usd-noodle')
-logger.setLevel(logging.INFO)
-if not len(logger.handlers):
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.DEBUG)
-    # fh = logging.FileHandler('/tmp/usd-noodle/test.log')
-    # fh.setLevel(logging.DEBUG)
-    logger.addHandler(ch)
-    # logger.addHandler(fh)
-logger.propagate = False
-
 
 def launch_usdview(usdfile):
     print('launching usdview', usdfile)
     subprocess.call(['usdview', usdfile], shell=True)
 
 
-class DependencyWalker(object):
-    def __init__(self, usdfile):
-        self.usdfile = usdfile
-        self.walk_attributes = True
-        
-        logger.info('DependencyWalker'.center(40, '-'))
-        logger.info('Loading usd file: {}'.format(self.usdfile))
-        self.nodes = {}
-        self.edges = []
-        
-        self.resolver = Ar.GetResolver()
-        
-        self.visited_nodes = []
-        
-        self.errored_nodes = []
-    
-    
-    def start(self):
-        self.visited_nodes = []
-        self.nodes = {}
-        self.edges = []
-        self.init_edges = []
-        
-        layer = Sdf.Layer.FindOrOpen(self.usdfile)
-        if not layer:
-            return
-        
-        # scrub the initial file path
-        # to get around upper/lowercase drive letters
-        # and junk like that
-        layer_path = Sdf.ComputeAssetPathRelativeToLayer(layer, os.path.basename(self.usdfile))
-        
-        self.usdfile = layer_path
-        
-        info = {}
-        info['online'] = os.path.isfile(layer_path)
-        info['path'] = layer_path
-        info['type'] = 'sublayer'
-        self.nodes[layer_path] = info
-        
-        self.walkStageLayers(layer_path)
-        
-        for edge in self.edges:
-            start = edge[0]
-            end = edge[1]
-            
-            info = self.nodes[end]
-            info['count'] = info.get("count", 0) + 1
-            self.nodes[end] = info
-    
-    
-    def get_flat_child_list(self, path):
-        ret = [path]
-        for key, child in path.nameChildren.items():
-            ret.extend(self.get_flat_child_list(child))
-        ret = list(set(ret))
-        return ret
-    
-    
-    def flatten_ref_list(self, ref_or_payload):
-        ret = []
-        for itemlist in [ref_or_payload.appendedItems, ref_or_payload.explicitItems, ref_or_payload.addedItems,
-                         ref_or_payload.prependedItems, ref_or_payload.orderedItems]:
-            for payload in itemlist:
-                ret.append(payload)
-        return list(set(ret))
-    
-    
-    def resolve(self, layer, path):
-        stage = Usd.Stage.Open(layer)
-        if stage:
-            resolved_path = stage.ResolveIdentifierToEditTarget(path)
-            return resolved_path
-        resolved = self.resolver.Resolve(path)
-        if resolved:
-            return resolved.GetPathString()
-        else:
-            # resolver will return None on invalid paths
-            # we still want the path regardless
-            return path
-    
-    
-    def walkStageLayers(self, layer_path, level=1):
-        id = '-' * (level)
-        
-        sublayers = []
-        payloads = []
-        references = []
-        
-        try:
-            layer = Sdf.Layer.FindOrOpen(layer_path)
-        except Tf.ErrorException as e:
-            info = {}
-            info['online'] = True
-            info['error'] = True
-            info['path'] = layer_path
-            self.nodes[layer_path] = info
-            self.errored_nodes.append(layer_path)
-            logger.info('usd file: {} had load errors'.format(layer_path))
-            return
-        
-        if not layer:
-            return
-        # print(id, layer.realPath)
-        root = layer.pseudoRoot
-        # print(id, 'root', root)
-        
-        # print(id, 'children'.center(40, '-'))
-        
-        child_list = []
-        # info packet from the root prim
-        if layer_path in self.nodes:
-            info = self.nodes[layer_path]
-            child_list = self.get_flat_child_list(root)
-            info_dict = dict()
-            for key in root.ListInfoKeys():
-                if key in ['subLayers', 'subLayerOffsets']:
-                    continue
-                info_dict[key] = root.GetInfo(key)
-            
-            info['info'] = info_dict
-            info['specifier'] = root.specifier.displayName
-            info['muted'] = layer.IsMuted()
-            info['defaultPrim'] = layer.defaultPrim
-            info['PseudoRoot'] = layer.pseudoRoot.name
-            info['RootPrims'] = [x.path.GetPrimPath().pathString for x in layer.rootPrims]
-            self.nodes[layer_path] = info
-        
-        for child in child_list:
-            # print(id, child)
-            
-            if self.walk_attributes:
-                attributes = child.attributes
-                for attr in attributes:
-                    # we are looking for "asset" type attributes
-                    # references to external things
-                    if attr.typeName == 'asset':
-                        value = attr.default
-                        # sometimes you get empty paths
-                        if not value:
-                            continue
-                        if not value.path:
-                            continue
-                        
-                        resolved_path = self.resolve(layer, value.path)
-                        info = {}
-                        info['online'] = os.path.isfile(resolved_path)
-                        info['path'] = resolved_path
-                        filebase, ext = os.path.splitext(resolved_path)
-                        info['type'] = 'ext'
-                        if ext in ['.jpg', '.tex', '.tx', '.png', '.exr', '.hdr', '.tga', '.tif', '.tiff',
-                                   '.pic', '.gif', '.psd', '.ptex', '.cin', '.dpx', '.bmp', '.iff',
-                                   '.mov', '.m4v', '.mp4', '.webp']:
-                            info['type'] = 'tex'
-                            info['colorspace'] = attr.colorSpace
-                        
-                        self.nodes[resolved_path] = info
-                        
-                        # so, we want to find out if this attribute is inside a shader
-                        # it's conceivable that asset attrs could exist outside of shaders
-                        # i just havent seen that in the wild yet
-                        # crawl through the ancestors - ie Material -> Shader -> Attribute
-                        owner = attr.owner
-                        owner_type = owner.typeName
-                        if owner_type == 'Shader':
-                            owner_parent = owner.nameParent
-                            if owner_parent.typeName == 'Material':
-                                material_path = '{}:{}'.format(os.path.splitext(layer.realPath)[0], owner_parent.name)
-                                info = {}
-                                info['online'] = True
-                                info['path'] = material_path
-                                info['type'] = 'material'
-                                
-                                self.nodes[material_path] = info
-                                
-                                # connect the material to the layer
-                                if not [layer_path, material_path, 'materials'] in self.edges:
-                                    self.edges.append([layer_path, material_path, 'materials'])
-                                
-                                # then connect the file to the material
-                                if not [material_path, resolved_path, owner.name] in self.edges:
-                                    self.edges.append([material_path, resolved_path, owner.name])
-                                
-                                continue
-                        
-                        # finally, if it doesn't smell like a material
-                        # then just set up a regular connectio to the layer
-                        if not [layer_path, resolved_path, info['type']] in self.edges:
-                            self.edges.append([layer_path, resolved_path, info['type']])
-            
-            clip_info = child.GetInfo("clips")
-            # pprint(clip_info)
-            for clip_set_name in clip_info:
-                clip_set = clip_info[clip_set_name]
-                # print(clip_set_name, clip_set.get("assetPaths"), clip_set.get("manifestAssetPath"), clip_set.get()
-                #     "primPath")
-                
-                """
-                @todo: subframe handling
-                integer frames: path/basename.###.usd
-                subinteger frames: path/basename.##.##.usd.
-                
-                @todo: non-1 increments
-                """
-                clip_asset_paths = clip_set.get("assetPaths")
-                # don't use resolved path in case either the first or last file is missing from disk
-                firstFile = str(clip_asset_paths[0].path)
-                lastFile = str(clip_asset_paths[-1].path)
-                if digitSearch.findall(firstFile):
-                    firstFileNum = digitSearch.findall(firstFile)[-1]
-                else:
-                    firstFileNum = '???'
-                
-                if digitSearch.findall(lastFile):
-                    lastFileNum = digitSearch.findall(lastFile)[-1]
-                else:
-                    lastFileNum = '???'
-                digitRange = str(firstFileNum + '-' + lastFileNum)
-                nodeName = ''
-                
-                firstFileParts = firstFile.split(firstFileNum)
-                for i in range(len(firstFileParts) - 1):
-                    nodeName += str(firstFileParts[i])
-                
-                nodeName += digitRange
-                nodeName += firstFileParts[-1]
-                
-                allFilesFound = True
-                for path in clip_asset_paths:
-                    clip_path = self.resolve(layer, path.path)
-                    if not os.path.isfile(clip_path):
-                        allFilesFound = False
-                        break
-                
-                # TODO : make more efficient - looping over everything currently
-                # TODO: validate presence of all files in the clip seq. bg thread?
-                
-                manifestPath = clip_set.get("manifestAssetPath")
-                refpath = self.resolve(layer, clip_asset_paths[0].path)
-                clipmanifest_path = self.resolve(layer, manifestPath.path)
-                
-                info = {}
-                info['online'] = allFilesFound
-                info['path'] = refpath
-                info['type'] = 'clip'
-                info['primPath'] = clip_set.get("primPath")
-                info['clipSet'] = clip_set_name
-                
-                self.nodes[nodeName] = info
-                
-                if not [layer_path, nodeName, 'clip'] in self.edges:
-                    self.edges.append([layer_path, nodeName, 'clip'])
-                
-                if not [nodeName, clipmanifest_path, 'manifest'] in self.edges:
-                    self.edges.append([nodeName, clipmanifest_path, 'manifest'])
-            
-            if child.variantSets:
-                for varset in child.variantSets:
-                    # print(child, 'variant set', varset.name)
-                    variant_path = '{}:{}'.format(os.path.splitext(layer.realPath)[0], varset.name)
-                    varprim = varset.owner
-                    
-                    info = {}
-                    info['online'] = True
-                    info['path'] = variant_path
-                    info['type'] = 'variant'
-                    info['variant_set'] = varset.name
-                    info['variants'] = [str(x) for x in varset.variants.keys()]
-                    
-                    info['current_variant'] = varprim.variantSelections.get(varset.name)
-                    
-                    self.nodes[variant_path] = info
-                    
-                    if not [layer_path, variant_path, 'variant'] in self.edges:
-                        self.edges.append([layer_path, variant_path, 'variant'])
-                    
-                    for variant_name in varset.variants.keys():
-                        variant = varset.variants[variant_name]
-                        
-                        # so variants can host payloads and references
-                        # we get to these through the variants primspec
-                        # and then add them to our list of paths to inspect
-                        if variant_name != info.get('current_variant'):
-                            continue
-                        for primspec_child in self.get_flat_child_list(variant.primSpec):
-                            
-                            for payload in self.flatten_ref_list(primspec_child.payloadList):
-                                pathToResolve = payload.assetPath
-                                if pathToResolve:
-                                    refpath = self.resolve(layer, pathToResolve)
-                                    payloads.append(refpath)
-                                    
-                                    info = {}
-                                    info['online'] = os.path.isfile(refpath)
-                                    info['path'] = refpath
-                                    info['type'] = 'payload'
-                                    
-                                    self.nodes[refpath] = info
-                                    
-                                    if not [variant_path, refpath, variant_name] in self.edges:
-                                        self.edges.append([variant_path, refpath, variant_name])
-                            
-                            for reference in self.flatten_ref_list(primspec_child.referenceList):
-                                pathToResolve = reference.assetPath
-                                if pathToResolve:
-                                    refpath = self.resolve(layer, pathToResolve)
-                                    references.append(refpath)
-                                    
-                                    info = {}
-                                    info['online'] = os.path.isfile(refpath)
-                                    info['path'] = refpath
-                                    info['type'] = 'reference'
-                                    
-                                    self.nodes[refpath] = info
-                                    
-                                    if not [variant_path, refpath, variant_name] in self.edges:
-                                        self.edges.append([variant_path, refpath, variant_name])
-            
-            payloadList = self.flatten_ref_list(child.payloadList)
-            for payload in payloadList:
-                pathToResolve = payload.assetPath
-                if pathToResolve:
-                    refpath = self.resolve(layer, pathToResolve)
-                    payloads.append(refpath)
-                    
-                    info = {}
-                    info['online'] = os.path.isfile(refpath)
-                    info['path'] = refpath
-                    info['type'] = 'payload'
-                    
-                    self.nodes[refpath] = info
-                    
-                    if not [layer_path, refpath, 'payload'] in self.edges:
-                        self.edges.append([layer_path, refpath, 'payload'])
-            
-            referenceList = self.flatten_ref_list(child.referenceList)
-            for reference in referenceList:
-                pathToResolve = reference.assetPath
-                if pathToResolve:
-                    refpath = self.resolve(layer, pathToResolve)
-                    references.append(refpath)
-                    
-                    info = {}
-                    info['online'] = os.path.isfile(refpath)
-                    info['path'] = refpath
-                    info['type'] = 'reference'
-                    
-                    self.nodes[refpath] = info
-                    
-                    if not [layer_path, refpath, 'reference'] in self.edges:
-                        self.edges.append([layer_path, refpath, 'reference'])
-        
-        for rel_sublayer in layer.subLayerPaths:
-            refpath = self.resolve(layer, rel_sublayer)
-            sublayers.append(refpath)
-            
-            info = {}
-            info['online'] = os.path.isfile(refpath)
-            info['path'] = refpath
-            info['type'] = 'sublayer'
-            self.nodes[refpath] = info
-            
-            if not [layer_path, refpath, 'sublayer'] in self.edges:
-                self.edges.append([layer_path, refpath, 'sublayer'])
-        
-        sublayers = list(set(sublayers))
-        references = list(set(references))
-        payloads = list(set(payloads))
-        
-        if sublayers:
-            logger.debug((id, 'sublayerPaths'.center(40, '-')))
-            logger.debug((id, sublayers))
-        for sublayer in sublayers:
-            self.walkStageLayers(sublayer, level=level + 1)
-        
-        if references:
-            logger.debug((id, 'references'.center(40, '-')))
-            logger.debug((id, references))
-        for reference in references:
-            self.walkStageLayers(reference, level=level + 1)
-        
-        if payloads:
-            logger.debug((id, 'payloads'.center(40, '-')))
-            logger.debug((id, payloads))
-        for payload in payloads:
-            self.walkStageLayers(payload, level=level + 1)
-
-
 def find_node(node_coll, attr_name, attr_value):
     for x in node_coll:
         node = node_coll[x]
@@ -485,13 +83,18 @@ class FindNodeWindow(QtWidgets.QDialog):
 
 
 class NodeGraphWindow(QtWidgets.QDialog):
-    def __init__(self, usdfile=None, walk_attributes=False, parent=None):
+    def __init__(self, usdfile=None, walk_attributes=False, workers=1, processes=0, walk_order='depth',
+                 use_cache=True, backend='python', scan_mode='full', max_depth=0, scope=None, budget=None,
+                 layer_memory=0, parent=None):
         super(NodeGraphWindow, self).__init__(parent)
         self.settings = QtCore.QSettings("chrisg", "usd-noodle")
         self.setWindowTitle("Noodle")
         self.build_ui()
         
-        self.noodle = NoodleWidget(usdfile=None, walk_attributes=walk_attributes, parent=self)
+        self.noodle = NoodleWidget(usdfile=None, walk_attributes=walk_attributes, workers=workers,
+                                   processes=processes, walk_order=walk_order, use_cache=use_cache, backend=backend,
+                                   scan_mode=scan_mode, max_depth=max_depth, scope=scope, budget=budget,
+                                   layer_memory=layer_memory, parent=self)
         self.noodle.file_loaded.connect(self.file_loaded)
         self.top_layout.addWidget(self.noodle)
         self.show()
@@ -527,19 +130,122 @@ class NodeGraphWindow(QtWidgets.QDialog):
         super(NodeGraphWindow, self).closeEvent(event)
 
 
+def node_state(info):
+    """
+    The parts of a node's info that change how it's drawn
+    """
+    return info.get('type'), info.get('online'), info.get('error', False), info.get('collapsed', False)
+
+
+class WalkerThread(QtCore.QThread):
+    """
+    Runs a DependencyWalker off the gui thread, handing the walk events back in batches
+    """
+    events_ready = QtCore.Signal(object)  # list of WalkEvents
+    progress = QtCore.Signal(int, int)  # layers, nodes
+    walk_finished = QtCore.Signal()
+    
+    
+    def __init__(self, walker, refresh_interval=0.1, walk=None, parent=None):
+        """
+        :param walk: function returning the WalkEvents to hand back. walker.walk by default
+        """
+        super(WalkerThread, self).__init__(parent)
+        self.walker = walker
+        self.walk = walk or walker.walk
+        self.refresh_interval = refresh_interval
+        self.incremental = False
+        self.automatic = False
+        # set when expanding a collapsed node into the graph that's there
+        self.expanding = None
+        # nodes added to the graph by this load
+        self.created = []
+        
+        self.layer_count = 0
+        self.node_count = 0
+        self.error = None
+    
+    
+    def cancel(self):
+        self.walker.cancel()
+    
+    
+    def run(self):
+        batch = []
+        last_refresh = time.time()
+        try:
+            for event in self.walk():
+                batch.append(event)
+                if event.kind == NODE_FOUND:
+                    self.node_count += 1
+                elif event.kind == LAYER_FINISHED:
+                    self.layer_count += 1
+                
+                if time.time() - last_refresh > self.refresh_interval:
+                    self.events_ready.emit(batch)
+                    self.progress.emit(self.layer_count, self.node_count)
+                    batch = []
+                    last_refresh = time.time()
+        except Exception as e:
+            # hand it over to the gui, rather than dying quietly on the thread
+            logger.exception('Walking {} failed'.format(self.walker.usdfile))
+            self.error = e
+        
+        self.events_ready.emit(batch)
+        self.progress.emit(self.layer_count, self.node_count)
+        self.walk_finished.emit()
+
+
 class NoodleWidget(QtWidgets.QWidget):
     file_loaded = QtCore.Signal(object)  # string
     
     
-    def __init__(self, usdfile=None, walk_attributes=False, parent=None):
+    def __init__(self, usdfile=None, walk_attributes=False, workers=1, processes=0, walk_order='depth',
+                 use_cache=True, backend='python', scan_mode='full', max_depth=0, scope=None, budget=None,
+                 layer_memory=0, parent=None):
         super(NoodleWidget, self).__init__(parent)
         self.settings = QtCore.QSettings("chrisg", "usd-noodle")
         
         self.usdfile = usdfile
         self.root_node = None
+        self.edges = EdgeStore()
         
         self.nodz = None
         self.walk_attributes = walk_attributes
+        self.workers = workers
+        self.processes = processes
+        self.walk_order = walk_order
+        self.backend = backend
+        # see DependencyWalker.scan_modes
+        self.scan_mode = scan_mode
+        # levels of layers to walk straight away, the rest are left collapsed. 0 walks everything
+        self.max_depth = max_depth
+        # optional ScopeRules and WalkBudget, see DependencyWalker
+        self.scope = scope
+        self.budget = budget
+        # keep layer scans on disk, so unchanged layers don't get opened again
+        self.use_cache = use_cache
+        self.layer_cache = None
+        # megabytes of layers to keep open between loads, going by their size on disk.
+        # 0 lets go of each layer once it's been scanned.
+        # layers something else already had open, like houdini, are never held or let go of
+        self.layer_lru = LayerLRU(layer_memory * 1024 * 1024, stat_cache=get_stat_cache())
+        # seconds between graph updates while a file loads
+        self.refresh_interval = 0.1
+        # walk on a background thread, so the ui stays alive
+        self.background = True
+        self.loader = None
+        self.old_loaders = []
+        # the last complete walk, kept for incremental reloads
+        self.walker = None
+        self.incremental_reload = True
+        # watch mode reloads by itself when files in the graph change
+        self.watcher = None
+        self.changed_files = set()
+        self.reload_pending = False
+        # node -> (node item, pen it had before being highlighted)
+        self.highlighted = {}
+        self.arranged_count = 0
         
         self.find_win = None
         self.build_ui()
@@ -549,6 +255,11 @@ class NoodleWidget(QtWidgets.QWidget):
     
     
     def cleanup(self):
+        self.set_watching(False)
+        self.cancel_load()
+        for loader in self.old_loaders:
+            loader.wait()
+        self.layer_lru.release()
         if self.find_win:
             self.find_win.close()
         self.settings.setValue("splitterSizes", self.splitter.saveState())
@@ -605,6 +316,25 @@ class NoodleWidget(QtWidgets.QWidget):
         self.saveImgBtn.clicked.connect(self.save_image)
         self.toolbar_lay.addWidget(self.saveImgBtn)
         
+        self.progress_bar = QtWidgets.QProgressBar()
+        # no idea how big the walk is going to be, so just show that it's busy
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setMaximumWidth(100)
+        self.toolbar_lay.addWidget(self.progress_bar)
+        
+        self.progress_label = QtWidgets.QLabel()
+        self.toolbar_lay.addWidget(self.progress_label)
+        
+        self.cancelBtn = QtWidgets.QPushButton("Cancel")
+        self.cancelBtn.clicked.connect(self.cancel_load)
+        self.toolbar_lay.addWidget(self.cancelBtn)
+        self.hide_progress()
+        
+        self.watchChk = QtWidgets.QCheckBox("Watch")
+        self.watchChk.setToolTip("Reload by itself when files in the graph change")
+        self.watchChk.toggled.connect(self.set_watching)
+        self.toolbar_lay.addWidget(self.watchChk)
+        
         toolbarspacer = QtWidgets.QSpacerItem(10, 10, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
         self.toolbar_lay.addItem(toolbarspacer)
         
@@ -645,6 +375,7 @@ class NoodleWidget(QtWidgets.QWidget):
         self.nodz.signal_NodeMoved.connect(self.on_nodeMoved)
         self.nodz.signal_NodeSelected.connect(self.on_nodeSelected)
         self.nodz.signal_NodeContextMenuEvent.connect(self.node_context_menu)
+        self.nodz.signal_NodeDoubleClicked.connect(self.expand_node)
         self.nodz.signal_KeyPressed.connect(self.pickwalk)
         
         if self.settings.value("splitterSizes"):
@@ -730,7 +461,7 @@ class NoodleWidget(QtWidgets.QWidget):
         userdata = node.userData
         path = userdata.get('path')
         if path:
-            self.info_panel.loadData(path, userdata)
+            self.info_panel.loadData(path, userdata, node_name=selected_nodes[0])
     
     
     def findWindow(self):
@@ -775,12 +506,11 @@ class NoodleWidget(QtWidgets.QWidget):
     
     
     def node_upstream(self, node_name):
-        start_node = self.get_node_from_name(node_name)
-        connected_nodes = start_node.upstream_nodes()
+        connected_nodes = self.edges.upstream(node_name)
         
         for node_name in self.nodz.scene().nodes:
             node = self.nodz.scene().nodes[node_name]
-            if node in connected_nodes:
+            if node_name in connected_nodes:
                 node.setSelected(True)
             else:
                 node.setSelected(False)
@@ -813,6 +543,9 @@ class NoodleWidget(QtWidgets.QWidget):
         menu.addAction("Select upstream", partial(self.node_upstream, node))
         menu.addAction("Reveal in filesystem", partial(self.reveal_file, node))
         
+        if self.is_collapsed(node):
+            menu.addAction("Expand", partial(self.expand_node, node))
+        
         usd_submenu = menu.addMenu("USD")
         usd_submenu.addAction("Inspect layer...", partial(self.view_usdfile, node))
         usd_submenu.addAction("UsdView...", partial(self.view_usdview, node))
@@ -829,122 +562,469 @@ class NoodleWidget(QtWidgets.QWidget):
         if not os.path.isfile(self.usdfile):
             raise RuntimeError("Cannot find file: %s" % self.usdfile)
         
-        self.nodz.clearGraph()
-        self.root_node = None
+        # a new load takes over from one that's still going
+        self.cancel_load()
+        
+        # reloading the file that's already up only re-walks the layers that changed,
+        # and patches the graph that's there
+        incremental = (self.incremental_reload and self.walker is not None and
+                       self.walker.usdfile == self.usdfile and
+                       self.walker.walk_attributes == self.walk_attributes and
+                       self.walker.backend == self.backend and
+                       self.walker.scan_mode == self.scan_mode)
+        if not incremental:
+            self.walker = None
+            self.nodz.clearGraph()
+            self.root_node = None
+            self.arranged_count = 0
         self.setWindowTitle('Noodle - {}'.format(self.usdfile))
         
-        x = DependencyWalker(self.usdfile)
+        if self.use_cache and self.layer_cache is None:
+            try:
+                self.layer_cache = LayerCache()
+            except Exception as e:
+                logger.warning('Layer cache unavailable, loading without it: {}'.format(e))
+                self.use_cache = False
+        
+        if not self.changed_files:
+            # a reload by hand should see the filesystem as it is now.
+            # watch mode has already forgotten the directories that changed
+            self.info_panel.stat_cache.clear()
+        
+        x = DependencyWalker(self.usdfile, layer_cache=self.layer_cache, stat_cache=self.info_panel.stat_cache,
+                             layer_lru=self.layer_lru)
         x.walk_attributes = self.walk_attributes
-        x.start()
-        
-        # get back the scrubbed initial file path
-        # which will let us find the start node properly
-        self.usdfile = x.usdfile
+        x.workers = self.workers
+        x.processes = self.processes
+        x.walk_order = self.walk_order
+        x.backend = self.backend
+        x.scan_mode = self.scan_mode
+        x.max_depth = self.max_depth
+        x.scope = self.scope
+        x.budget = self.budget
+        x.keep_scans = self.incremental_reload
+        if incremental:
+            x.previous_scans = self.walker.scans
+            # anything opened up by hand stays open
+            x.expanded = set(self.walker.expanded)
+        
+        # the graph gets built in batches as the walk goes,
+        # so there's something to look at straight away
+        loader = WalkerThread(x, refresh_interval=self.refresh_interval, parent=self)
+        loader.incremental = incremental
+        loader.automatic = bool(self.changed_files)
+        loader.events_ready.connect(partial(self.on_events_ready, loader))
+        loader.progress.connect(partial(self.on_load_progress, loader))
+        loader.walk_finished.connect(partial(self.on_load_finished, loader))
+        self.loader = loader
+        
+        self.progress_label.setText('Loading...')
+        self.progress_bar.show()
+        self.progress_label.show()
+        self.cancelBtn.show()
+        
+        if self.background:
+            loader.start()
+        else:
+            # run the walk right here, the signals go straight through
+            loader.run()
+    
+    
+    def cancel_load(self):
+        if self.loader is None:
+            return
+        self.loader.cancel()
+        if self.loader.isRunning():
+            # hang on to it until the thread winds down
+            self.old_loaders.append(self.loader)
+        self.loader = None
+        self.hide_progress()
+    
+    
+    def hide_progress(self):
+        self.progress_bar.hide()
+        self.progress_label.hide()
+        self.cancelBtn.hide()
+    
+    
+    def on_events_ready(self, loader, events):
+        if loader is not self.loader or loader.incremental:
+            # left over from a load that's been replaced,
+            # or a reload that gets applied in one go at the end
+            return
+        loader.created.extend(self.add_events(loader.walker, events, arrange=not loader.expanding))
+    
+    
+    def on_load_progress(self, loader, layer_count, node_count):
+        if loader is not self.loader:
+            return
+        self.progress_label.setText('{} layers, {} nodes'.format(layer_count, node_count))
+    
+    
+    def on_load_finished(self, loader):
+        if loader in self.old_loaders:
+            self.old_loaders.remove(loader)
+        if loader is not self.loader:
+            return
+        self.loader = None
+        self.hide_progress()
         
-        nodz_scene = self.nodz.scene()
+        x = loader.walker
         
-        # pprint(x.nodes)
-        nds = []
-        for i, node in enumerate(x.nodes):
-            
-            info = x.nodes[node]
-            
-            pos = QtCore.QPointF(0, 0)
-            node_label = os.path.basename(node)
-            
-            # node colouring / etc based on the node type
-            node_preset = 'node_default'
-            node_icon = "sublayer.png"
-            if info.get("type") == 'clip':
-                node_preset = 'node_clip'
-                node_icon = "clip.png"
-            elif info.get("type") == 'payload':
-                node_preset = 'node_payload'
-                node_icon = "payload.png"
-            elif info.get("type") == 'variant':
-                node_preset = 'node_variant'
-                node_icon = "variant.png"
-            elif info.get("type") == 'specialize':
-                node_preset = 'node_specialize'
-                node_icon = "specialize.png"
-            elif info.get("type") == 'reference':
-                node_preset = 'node_reference'
-                node_icon = "reference.png"
-            elif info.get("type") == 'tex':
-                node_preset = 'node_texture'
-                node_icon = "texture.png"
-            elif info.get("type") == 'material':
-                node_preset = 'node_material'
-                node_icon = "material.png"
+        if loader.expanding:
+            self.place_new_nodes(loader.created, x.edges)
+            logger.info('expanded {}: {} new nodes'.format(loader.expanding, len(loader.created)))
+        else:
+            if loader.incremental:
+                if not x.cancelled and not loader.error:
+                    self.apply_diff(x)
+            else:
+                # layout nodes!
+                self.nodz.arrangeGraph(self.root_node)
+                # self.nodz.autoLayoutGraph()
+                self.nodz._focus()
+            # only a complete walk is any good to diff against
+            if not x.cancelled and not loader.error:
+                self.walker = x
             
-            if not node in nds:
-                nodeA = self.nodz.createNode(name=node, label=node_label, preset=node_preset, position=pos)
-                if self.usdfile == node:
-                    self.root_node = nodeA
-                    node_icon = "noodle.png"
-                
-                icon = QtGui.QIcon(os.path.join(os.path.dirname(os.path.abspath(__file__)), "icons", node_icon))
-                nodeA.icon = icon
-                nodeA.setToolTip(node_label)
-                
-                if nodeA:
-                    self.nodz.createAttribute(node=nodeA, name='out', index=0, preset='attr_preset_1',
-                                              plug=True, socket=False, dataType=int, socketMaxConnections=-1)
-                    
-                    nodeA.userData = info
-                    
-                    if info.get('error', False) is True:
-                        self.nodz.createAttribute(node=nodeA, name='ERROR', index=0, preset='attr_preset_2',
-                                                  plug=False, socket=False)
-                    if info['online'] is False:
-                        self.nodz.createAttribute(node=nodeA, name='OFFLINE', index=0, preset='attr_preset_2',
-                                                  plug=False, socket=False)
-                        # override the node's draw pen with a
-                        # lovely red outline
-                        nodeA._pen = QtGui.QPen()
-                        nodeA._pen.setStyle(QtCore.Qt.SolidLine)
-                        nodeA._pen.setWidth(5)
-                        nodeA._pen.setColor(QtGui.QColor(255, 0, 0))
-                
-                nds.append(node)
+            if loader.automatic:
+                self.highlight_nodes(self.changed_files)
+            # files that change while expanding are kept for the reload they set off
+            self.changed_files = set()
         
-        # pprint(x.edges)
+        # an expansion adds layers to the walker that's up, so watch what's in it now
+        if self.watcher is not None and x is self.walker:
+            self.watcher.watch(self.watched_paths())
         
-        # 'wiring nodes'.center(40, '-')
-        # create all the node connections
-        for edge in x.edges:
-            
-            start = edge[0]
-            end = edge[1]
-            port_type = edge[2]
-            try:
-                start_node = self.nodz.scene().nodes[start]
-                self.nodz.createAttribute(node=start_node, name=port_type, index=-1, preset='attr_preset_1',
-                                          plug=False, socket=True, dataType=int, socketMaxConnections=-1)
-                # # sort the ports alphabetically
-                # start_node.attrs = sorted(start_node.attrs)
-                
-                self.nodz.createConnection(end, 'out', start, port_type)
-            except:
-                print('cannot find start node', start)
+        if loader.error:
+            QtWidgets.QMessageBox.warning(self, 'Loading failed', str(loader.error), QtWidgets.QMessageBox.Ok)
         
-        # layout nodes!
-        self.nodz.arrangeGraph(self.root_node)
-        # self.nodz.autoLayoutGraph()
-        self.nodz._focus()
-        
-        if x.errored_nodes:
+        # don't pop up the same errors every time something changes
+        if x.errored_nodes and not loader.automatic and not loader.expanding:
             message = 'Some layers had load errors:\n'
             for errpath in x.errored_nodes:
                 message += '{}\n'.format(errpath)
             QtWidgets.QMessageBox.warning(self, 'File Parsing errors', message, QtWidgets.QMessageBox.Ok)
         
-        self.file_loaded.emit(self.usdfile)
+        if x.truncated and not loader.automatic and not loader.expanding:
+            QtWidgets.QMessageBox.warning(self, 'Graph truncated',
+                                          'The walk stopped at {}.\n'
+                                          'Layers it didn\'t get to are collapsed.'.format(x.truncated),
+                                          QtWidgets.QMessageBox.Ok)
+        
+        if x.cancelled:
+            logger.info('loading cancelled, the graph is incomplete')
+        
+        if not loader.expanding:
+            self.file_loaded.emit(self.usdfile)
+        
+        if self.reload_pending:
+            # more changes came in while that was going
+            self.reload_pending = False
+            self.load_file()
+    
+    
+    def set_watching(self, state):
+        if state and self.watcher is None:
+            self.watcher = GraphWatcher(self)
+            self.watcher.files_changed.connect(self.on_files_changed)
+            if self.walker is not None:
+                self.watcher.watch(self.watched_paths())
+        elif not state and self.watcher is not None:
+            self.watcher.stop()
+            self.watcher.deleteLater()
+            self.watcher = None
+            self.reload_pending = False
+    
+    
+    def watched_paths(self):
+        """
+        Files on disk behind the nodes in the graph
+        """
+        paths = set()
+        for info in self.walker.nodes.values():
+            # materials and variants live inside their layers
+            if info.get('type') in ['material', 'variant']:
+                continue
+            if info.get('path'):
+                paths.add(info['path'])
+        return paths
+    
+    
+    def on_files_changed(self, paths):
+        for path in paths:
+            self.info_panel.stat_cache.invalidate(path)
+        self.changed_files.update(paths)
+        if self.loader is not None:
+            self.reload_pending = True
+            return
+        self.load_file()
+    
+    
+    def highlight_nodes(self, node_names):
+        """
+        Outline nodes, to show they've just changed. The last lot get their old outline back
+        """
+        scene_nodes = self.nodz.scene().nodes
+        for name, (node, pen) in self.highlighted.items():
+            # rebuilt nodes come back with their own outline
+            if scene_nodes.get(name) is node:
+                node._pen = pen
+                node.update()
+        self.highlighted = {}
+        
+        for name in node_names:
+            node = scene_nodes.get(name)
+            if node is None:
+                continue
+            self.highlighted[name] = (node, node._pen)
+            pen = QtGui.QPen(node._pen)
+            pen.setWidth(5)
+            pen.setColor(QtGui.QColor(255, 200, 0))
+            node._pen = pen
+            node.update()
+    
+    
+    def apply_diff(self, walker):
+        """
+        Bring the graph up to date with a new walk of the same file.
+        Only nodes and connections that changed are touched,
+        everything else keeps its position and selection
+        """
+        scene_nodes = self.nodz.scene().nodes
+        old_edges = self.edges
+        new_edges = walker.edges
+        
+        for edge in old_edges:
+            if edge not in new_edges:
+                self.remove_connection(*edge)
+        
+        # nodes that need to look different get rebuilt where they were
+        rebuilt = set()
+        positions = {}
+        selected = set()
+        for name in list(scene_nodes):
+            node = scene_nodes[name]
+            info = walker.nodes.get(name)
+            if info is not None and node_state(info) == node_state(node.userData):
+                node.userData = info
+                continue
+            if info is not None:
+                rebuilt.add(name)
+                positions[name] = node.pos()
+            if node.isSelected():
+                selected.add(name)
+            if node is self.root_node:
+                self.root_node = None
+            self.nodz.deleteNode(node)
+        
+        added = []
+        for name, info in walker.nodes.items():
+            if name in scene_nodes:
+                continue
+            node = self.create_node(name, info)
+            if name in positions:
+                node.setPos(positions[name])
+                node.setSelected(name in selected)
+            else:
+                added.append(name)
+        
+        for edge in new_edges:
+            if edge not in old_edges or edge[0] in rebuilt or edge[1] in rebuilt:
+                self.create_connection(*edge)
+        
+        self.place_new_nodes(added, new_edges)
+        
+        self.edges = new_edges
+        self.info_panel.edges = new_edges
+        logger.info('reload: {} layers rescanned, {} nodes added, {} rebuilt, {} connections'.format(
+            len(walker.rescanned), len(added), len(rebuilt), len(new_edges)))
+    
+    
+    def add_events(self, walker, events, arrange=True):
+        """
+        Add a batch of walk events to the graph
+        :param arrange: lay the graph out again as it grows
+        :return: names of the nodes that were created
+        """
+        created = []
+        # get back the scrubbed initial file path
+        # which will let us find the start node properly
+        self.usdfile = walker.usdfile
+        # the walker starts a new edge store when it gets going
+        self.edges = walker.edges
+        self.info_panel.edges = walker.edges
+        
+        for event in events:
+            if event.kind == NODE_FOUND:
+                if self.create_node(event.path, event.info):
+                    created.append(event.path)
+            elif event.kind == EDGE_FOUND:
+                self.create_connection(*event.edge)
+            elif event.kind == LAYER_FINISHED:
+                node = self.nodz.scene().nodes.get(event.path)
+                if not node:
+                    continue
+                # load errors only turn up once the layer's been walked
+                if event.info and event.info.get('error', False) is True:
+                    self.nodz.createAttribute(node=node, name='ERROR', index=0, preset='attr_preset_2',
+                                              plug=False, socket=False)
+                # collapsed layers can get walked after all, if they're found again higher up
+                if 'COLLAPSED' in node.attrs:
+                    self.nodz.deleteAttribute(node, node.attrs.index('COLLAPSED'))
+        
+        # only re-arrange when the graph has doubled in size,
+        # so laying out as we go doesn't turn into most of the work
+        node_count = len(self.nodz.scene().nodes)
+        if arrange and node_count > self.arranged_count * 2:
+            self.nodz.arrangeGraph(self.root_node)
+            self.arranged_count = node_count
+        return created
+    
+    
+    def create_node(self, node, info):
+        pos = QtCore.QPointF(0, 0)
+        node_label = os.path.basename(node)
+        
+        # node colouring / etc based on the node type
+        node_preset = 'node_default'
+        node_icon = "sublayer.png"
+        if info.get("type") == 'clip':
+            node_preset = 'node_clip'
+            node_icon = "clip.png"
+        elif info.get("type") == 'payload':
+            node_preset = 'node_payload'
+            node_icon = "payload.png"
+        elif info.get("type") == 'variant':
+            node_preset = 'node_variant'
+            node_icon = "variant.png"
+        elif info.get("type") == 'specialize':
+            node_preset = 'node_specialize'
+            node_icon = "specialize.png"
+        elif info.get("type") == 'reference':
+            node_preset = 'node_reference'
+            node_icon = "reference.png"
+        elif info.get("type") == 'tex':
+            node_preset = 'node_texture'
+            node_icon = "texture.png"
+        elif info.get("type") == 'material':
+            node_preset = 'node_material'
+            node_icon = "material.png"
+        
+        nodeA = self.nodz.createNode(name=node, label=node_label, preset=node_preset, position=pos)
+        if self.usdfile == node:
+            self.root_node = nodeA
+            node_icon = "noodle.png"
+        
+        icon = QtGui.QIcon(os.path.join(os.path.dirname(os.path.abspath(__file__)), "icons", node_icon))
+        nodeA.icon = icon
+        nodeA.setToolTip(node_label)
+        
+        if nodeA:
+            self.nodz.createAttribute(node=nodeA, name='out', index=0, preset='attr_preset_1',
+                                      plug=True, socket=False, dataType=int, socketMaxConnections=-1)
+            
+            nodeA.userData = info
+            
+            if info.get('error', False) is True:
+                self.nodz.createAttribute(node=nodeA, name='ERROR', index=0, preset='attr_preset_2',
+                                          plug=False, socket=False)
+            if info.get('collapsed', False) is True:
+                # not walked yet, double click to expand
+                self.nodz.createAttribute(node=nodeA, name='COLLAPSED', index=0, preset='attr_preset_1',
+                                          plug=False, socket=False)
+            if info['online'] is False:
+                self.nodz.createAttribute(node=nodeA, name='OFFLINE', index=0, preset='attr_preset_2',
+                                          plug=False, socket=False)
+                # override the node's draw pen with a
+                # lovely red outline
+                nodeA._pen = QtGui.QPen()
+                nodeA._pen.setStyle(QtCore.Qt.SolidLine)
+                nodeA._pen.setWidth(5)
+                nodeA._pen.setColor(QtGui.QColor(255, 0, 0))
+        return nodeA
+    
+    
+    def place_new_nodes(self, node_names, edges):
+        """
+        Put new nodes next to whatever found them, without moving anything else
+        """
+        scene_nodes = self.nodz.scene().nodes
+        placed = set()
+        offsets = {}
+        # anything found by another new node goes next to that, once it's been placed
+        for name in node_names:
+            parents = [x for x in edges.dependents(name)
+                       if x in scene_nodes and (x in placed or x not in node_names)]
+            if not parents:
+                continue
+            parent = scene_nodes[parents[0]]
+            offsets[parents[0]] = offsets.get(parents[0], 0) + 1
+            scene_nodes[name].setPos(parent.pos() + QtCore.QPointF(-300, 80 * offsets[parents[0]]))
+            placed.add(name)
+    
+    
+    def is_collapsed(self, node_name):
+        return (self.walker is not None and node_name in self.walker.collapsed and
+                node_name not in self.walker.visited_nodes)
+    
+    
+    def expand_node(self, node_name):
+        """
+        Walk a collapsed node in the background, and add what turns up to the graph
+        """
+        if not self.is_collapsed(node_name) or self.loader is not None:
+            return
+        
+        loader = WalkerThread(self.walker, refresh_interval=self.refresh_interval,
+                              walk=partial(self.walker.expand, node_name), parent=self)
+        loader.expanding = node_name
+        loader.events_ready.connect(partial(self.on_events_ready, loader))
+        loader.progress.connect(partial(self.on_load_progress, loader))
+        loader.walk_finished.connect(partial(self.on_load_finished, loader))
+        self.loader = loader
+        
+        self.progress_label.setText('Expanding...')
+        self.progress_bar.show()
+        self.progress_label.show()
+        self.cancelBtn.show()
+        
+        if self.background:
+            loader.start()
+        else:
+            loader.run()
+    
+    
+    def remove_connection(self, start, end, port_type):
+        start_node = self.nodz.scene().nodes.get(start)
+        if start_node is None or port_type not in start_node.sockets:
+            return
+        socket = start_node.sockets[port_type]
+        for conn in list(socket.connections):
+            if conn.plugNode == end:
+                conn._remove()
+        if not socket.connections:
+            self.nodz.deleteAttribute(start_node, start_node.attrs.index(port_type))
+    
+    
+    def create_connection(self, start, end, port_type):
+        try:
+            start_node = self.nodz.scene().nodes[start]
+            self.nodz.createAttribute(node=start_node, name=port_type, index=-1, preset='attr_preset_1',
+                                      plug=False, socket=True, dataType=int, socketMaxConnections=-1)
+            # # sort the ports alphabetically
+            # start_node.attrs = sorted(start_node.attrs)
+            
+            self.nodz.createConnection(end, 'out', start, port_type)
+        except:
+            print('cannot find start node', start)
     
     
     def save_image(self):
         
-        multipleFilters = "Image Files (*.jpg *.png) (*.jpg *.png);;All Files (*.*) (*.*)"
+        multipleFilters = ("Image Files (*.jpg *.png) (*.jpg *.png);;"
+                           "Graph Files (*.jsonl *.graphml *.dot *.csv) (*.jsonl *.graphml *.dot *.csv);;"
+                           "All Files (*.*) (*.*)")
         options = QtWidgets.QFileDialog.DontUseNativeDialog
         try:
             # qt 5.2 and up
@@ -955,6 +1035,11 @@ class NoodleWidget(QtWidgets.QWidget):
         filename = QtWidgets.QFileDialog.getSaveFileName(self, 'Save image file', '/', multipleFilters,
                                                          None, options)
         if filename[0]:
+            if export.guess_format(filename[0]) and self.walker is not None:
+                print('saving graph:', filename[0])
+                export.export_graph(self.walker.nodes, self.edges, filename[0])
+                return
+            
             print('saving image:', filename[0])
             
             self.nodz.save_image(filename[0])
@@ -993,7 +1078,11 @@ class NoodleWidget(QtWidgets.QWidget):
             self.load_file()
 
 
-def main(usdfile=None, walk_attributes=False):
+def main(usdfile=None, walk_attributes=False, workers=1, processes=0, walk_order='depth', use_cache=True,
+         backend='python', scan_mode='full', max_depth=0, scope=None, budget=None, layer_memory=0):
     par = QtWidgets.QApplication.activeWindow()
-    win = NodeGraphWindow(usdfile=usdfile, parent=par, walk_attributes=walk_attributes)
+    win = NodeGraphWindow(usdfile=usdfile, parent=par, walk_attributes=walk_attributes, workers=workers,
+                          processes=processes, walk_order=walk_order, use_cache=use_cache, backend=backend,
+                          scan_mode=scan_mode, max_depth=max_depth, scope=scope, budget=budget,
+                          layer_memory=layer_memory)
     return win
@@ -0,0 +1,168 @@
+"""
+Walks many root files at once, sharing caches between them, and reports
+what each one depends on and which layers they have in common.
+Like headless, never imports Qt
+"""
+from __future__ import print_function
+import copy
+import glob
+import json
+import logging
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+from .walker import logger
+from .resolve_cache import ResolveCache
+from .layer_cache import LayerCache, MemoryLayerCache
+from .layer_lru import LayerLRU
+from .path_table import PathTable
+from .stat_cache import get_stat_cache
+from . import headless
+
+
+def expand_roots(patterns):
+    """
+    :param patterns: file paths or globs. @file reads more of them from a file, one per line
+    :return: root files, in the order given, without repeats
+    """
+    roots = []
+    for pattern in patterns:
+        if pattern.startswith('@'):
+            with open(pattern[1:]) as f:
+                roots.extend(expand_roots([x.strip() for x in f if x.strip() and not x.startswith('#')]))
+            continue
+        matches = sorted(glob.glob(pattern))
+        # a path that doesn't exist is kept, so it gets reported as an error rather than dropped
+        roots.extend(matches or [pattern])
+    seen = set()
+    return [x for x in roots if not (x in seen or seen.add(x))]
+
+
+def walk_batch(roots, jobs=4, use_cache=True, layer_memory=1024, budget=None, **kwargs):
+    """
+    Walk every root, jobs at a time.
+    
+    The walks share a resolve cache, stat cache, path table and scan cache,
+    and a LayerLRU, so a layer that a whole sequence of shots points at is parsed once
+    and stays open for the next shot to use, up to layer_memory megabytes of layers.
+    Layers whose asset paths are all anchored or absolute have their scans shared between every root.
+    Scans of layers with search paths are keyed on the resolver context too, so with the default
+    resolver only roots in the same directory share those.
+    
+    :param use_cache: share scans through the on-disk LayerCache, rather than in memory
+    :param budget: WalkBudget, applied to each root separately
+    :param kwargs: passed on to headless.walk
+    :return: batch report dict, see format_batch_report
+    """
+    layer_cache = None
+    if use_cache:
+        try:
+            layer_cache = LayerCache()
+        except Exception as e:
+            logger.warning('Layer cache unavailable, sharing scans in memory: {}'.format(e))
+    if layer_cache is None:
+        layer_cache = MemoryLayerCache()
+    stat_cache = get_stat_cache()
+    caches = {
+        'resolve_cache': ResolveCache(),
+        'layer_cache': layer_cache,
+        'layer_lru': LayerLRU(layer_memory * 1024 * 1024, stat_cache=stat_cache),
+        'path_table': PathTable(),
+    }
+    
+    def walk_root(root):
+        start = time.time()
+        try:
+            report = headless.walk(root, closure=True, budget=copy.copy(budget) if budget else None,
+                                   **dict(kwargs, **caches))
+        except Exception as e:
+            logger.exception('Walking {} failed'.format(root))
+            report = {'usdfile': root, 'layers': 0, 'nodes': 0, 'edges': 0, 'offline': [],
+                      'errors': ['{}: {}'.format(root, e)], 'truncated': None, 'closure': []}
+        report['seconds'] = time.time() - start
+        return report
+    
+    start = time.time()
+    pool = ThreadPool(max(1, jobs))
+    try:
+        reports = pool.map(walk_root, roots, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    
+    # how many roots each node turns up in
+    usage = {}
+    for report in reports:
+        for path in set(report['closure']):
+            usage[path] = usage.get(path, 0) + 1
+    shared = sorted(((path, count) for path, count in usage.items() if count > 1), key=lambda x: (-x[1], x[0]))
+    
+    caches['layer_lru'].release()
+    if use_cache:
+        layer_cache.close()
+    
+    return {
+        'roots': reports,
+        'unique_nodes': len(usage),
+        'shared': [{'path': path, 'roots': count} for path, count in shared],
+        'seconds': time.time() - start,
+        'resolve_cache': caches['resolve_cache'].stats(),
+        'layer_cache': layer_cache.stats(),
+        'layer_lru': caches['layer_lru'].stats(),
+    }
+
+
+def format_batch_report(report, closures=False):
+    """
+    The batch report as text. A line per root, then the nodes shared between roots, most shared first
+    :param closures: list every root's dependencies too
+    """
+    lines = []
+    for root in report['roots']:
+        lines.append('{usdfile}: layers {layers}, nodes {nodes}, edges {edges}, offline {offline}, '
+                     'errors {errors}, {seconds:.2f}s'.format(**dict(root, offline=len(root['offline']),
+                                                                      errors=len(root['errors']))))
+        if root['truncated']:
+            lines.append('    truncated: {}'.format(root['truncated']))
+        for offline in root['offline']:
+            lines.append('    offline: {} ({})'.format(offline['path'], offline['type']))
+        for error in root['errors']:
+            lines.append('    error: {}'.format(error))
+        if closures:
+            for path in root['closure']:
+                lines.append('    {}'.format(path))
+    lines.append('roots: {}'.format(len(report['roots'])))
+    lines.append('unique nodes: {}'.format(report['unique_nodes']))
+    lines.append('shared by more than one root: {}'.format(len(report['shared'])))
+    for shared in report['shared']:
+        lines.append('    {roots:>5}  {path}'.format(**shared))
+    lines.append('seconds: {:.2f}'.format(report['seconds']))
+    return '\n'.join(lines) + '\n'
+
+
+def run(patterns, output=None, as_json=False, verbose=False, closures=False, **kwargs):
+    """
+    Walk every root matching the patterns and write the batch report
+    :param output: file to write to, stdout if None
+    :param as_json: write json rather than text. json always has every root's closure
+    :param kwargs: passed on to walk_batch
+    :return: exit code. 1 if any root has offline files or errors, 0 if not
+    """
+    if not verbose:
+        logger.setLevel(logging.WARNING)
+    
+    roots = expand_roots(patterns)
+    report = walk_batch(roots, **kwargs)
+    if as_json:
+        text = json.dumps(report, indent=2) + '\n'
+    else:
+        text = format_batch_report(report, closures=closures)
+    
+    if output:
+        with open(output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    
+    return 1 if any(x['offline'] or x['errors'] for x in report['roots']) else 0
@@ -0,0 +1,266 @@
+"""
+Value clip sequences: naming them, and checking their frames are on disk
+without resolving or stat'ing every clip
+"""
+import os.path
+import re
+
+from pxr import Sdf
+
+digitSearch = re.compile(r'\b\d+\b')
+templateSearch = re.compile(r'(#+)(\.#+)?')
+hashSearch = re.compile(r'#+')
+
+
+class ClipSequence(object):
+    """
+    What a clip set's assets look like on disk
+    """
+    __slots__ = ['name', 'path', 'paths', 'frames', 'missing']
+    
+    
+    def __init__(self, name, path):
+        self.name = name
+        # first clip, resolved
+        self.path = path
+        # every clip, resolved
+        self.paths = []
+        # frame number of every clip
+        self.frames = []
+        # frame numbers of the clips that aren't there
+        self.missing = []
+
+
+def frame_ranges(frames):
+    """
+    Compact frame numbers into (first, last) ranges
+    [1, 2, 3, 7, 9, 10] -> [(1, 3), (7, 7), (9, 10)]
+    """
+    ranges = []
+    for frame in sorted(set(frames)):
+        if ranges and frame - ranges[-1][1] == 1:
+            ranges[-1] = (ranges[-1][0], frame)
+        else:
+            ranges.append((frame, frame))
+    return ranges
+
+
+def format_ranges(frames):
+    """
+    [1, 2, 3, 7, 9, 10] -> '1-3, 7, 9-10'
+    """
+    parts = []
+    for first, last in frame_ranges(frames):
+        if first == last:
+            parts.append(str(first))
+        else:
+            parts.append('{}-{}'.format(first, last))
+    return ', '.join(parts)
+
+
+def parse_ranges(text):
+    """
+    '1-3, 7, 9-10' -> [1, 2, 3, 7, 9, 10]
+    """
+    frames = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        frames.extend(range(int(first), int(last or first) + 1))
+    return frames
+
+
+def expand_template(template, start, end, stride):
+    """
+    Asset paths for a template clip set.
+    integer frames: path/basename.###.usd
+    subinteger frames: path/basename.###.##.usd
+    """
+    match = templateSearch.search(template)
+    if not match or not stride:
+        return []
+    int_pad = len(match.group(1))
+    frac_pad = len(match.group(2)) - 1 if match.group(2) else 0
+    
+    paths = []
+    count = int(round((end - start) / float(stride)))
+    for i in range(count + 1):
+        time = start + i * stride
+        if frac_pad:
+            whole = int(time)
+            frac = int(round((time - whole) * 10 ** frac_pad))
+            frame = '{:0{}d}.{:0{}d}'.format(whole, int_pad, frac, frac_pad)
+        else:
+            frame = '{:0{}d}'.format(int(round(time)), int_pad)
+        paths.append(template[:match.start()] + frame + template[match.end():])
+    return paths
+
+
+def clip_asset_paths(clip_set):
+    """
+    Asset paths of a clip set as authored, whether it lists them or uses a template
+    """
+    asset_paths = clip_set.get("assetPaths")
+    if asset_paths:
+        return [str(x.path) for x in asset_paths]
+    template = clip_set.get("templateAssetPath")
+    if template:
+        return expand_template(template,
+                               clip_set.get("templateStartTime", 0),
+                               clip_set.get("templateEndTime", 0),
+                               clip_set.get("templateStride", 1))
+    return []
+
+
+def clip_frames(asset_paths):
+    """
+    Frame number of every clip, going by the last number in its file name, or its index if there isn't one
+    """
+    frames = []
+    for i, asset_path in enumerate(asset_paths):
+        digits = digitSearch.findall(os.path.basename(asset_path))
+        frames.append(int(digits[-1]) if digits else i)
+    return frames
+
+
+def clip_node_name(first_file, last_file):
+    """
+    path/basename.0001.usd, path/basename.0100.usd -> path/basename.0001-0100.usd
+    """
+    if digitSearch.findall(first_file):
+        first_num = digitSearch.findall(first_file)[-1]
+    else:
+        first_num = '???'
+    
+    if digitSearch.findall(last_file):
+        last_num = digitSearch.findall(last_file)[-1]
+    else:
+        last_num = '???'
+    digit_range = str(first_num + '-' + last_num)
+    
+    node_name = ''
+    first_parts = first_file.split(first_num)
+    for i in range(len(first_parts) - 1):
+        node_name += str(first_parts[i])
+    
+    node_name += digit_range
+    node_name += first_parts[-1]
+    return node_name
+
+
+def scan_clip_set(layer, clip_set, resolve, stat_cache):
+    """
+    Work out which clips in the set are on disk.
+    Only the first clip goes through the resolver, the rest sit next to it
+    unless they're authored somewhere else. Each directory is listed once.
+    
+    @todo: subframe clips get numbered by their fraction
+    @todo: non-1 increments in the node name
+    
+    :param layer: Sdf.Layer the clips are authored in
+    :param clip_set: clip set dictionary
+    :param resolve: function(layer, path) returning the resolved path
+    :param stat_cache: StatCache to list directories with
+    :return: ClipSequence or None if the set has no clips
+    """
+    asset_paths = clip_asset_paths(clip_set)
+    if not asset_paths:
+        return None
+    
+    # don't use resolved path in case either the first or last file is missing from disk
+    clip = ClipSequence(clip_node_name(asset_paths[0], asset_paths[-1]), resolve(layer, asset_paths[0]))
+    
+    first_dir = os.path.dirname(Sdf.ComputeAssetPathRelativeToLayer(layer, asset_paths[0]))
+    resolved_dir = os.path.dirname(clip.path)
+    
+    for asset_path in asset_paths:
+        anchored = Sdf.ComputeAssetPathRelativeToLayer(layer, asset_path)
+        if os.path.dirname(anchored) == first_dir:
+            clip.paths.append(os.path.join(resolved_dir, os.path.basename(anchored)))
+        else:
+            clip.paths.append(resolve(layer, asset_path))
+    clip.frames = clip_frames(asset_paths)
+    clip.missing = find_missing(clip.paths, clip.frames, stat_cache)
+    return clip
+
+
+def find_missing(paths, frames, stat_cache):
+    """
+    :param paths: resolved clip paths
+    :param frames: their frame numbers
+    :return: sorted frame numbers of the clips that aren't on disk. each directory is listed once
+    """
+    directories = {}
+    for i, clip_path in enumerate(paths):
+        directories.setdefault(os.path.dirname(clip_path), []).append(i)
+    
+    missing = []
+    for directory, indices in directories.items():
+        entries = stat_cache.listing(directory) or {}
+        for i in indices:
+            entry = entries.get(os.path.normcase(os.path.basename(paths[i])))
+            if entry is None or not entry.is_file:
+                missing.append(frames[i])
+    return sorted(missing)
+
+
+def path_pattern(paths, frames):
+    """
+    Squash resolved clip paths down to their directory and a file name with #s where the frame goes
+    /shot/clips/anim.0001.usd ... /shot/clips/anim.2000.usd -> ('/shot/clips', 'anim.####.usd')
+    :return: (directory, pattern), or None if they aren't all in the one directory and named alike
+    """
+    directory, name = os.path.split(paths[0])
+    numbers = list(digitSearch.finditer(name))
+    if not numbers:
+        return None
+    last = numbers[-1]
+    pattern = name[:last.start()] + '#' * len(last.group()) + name[last.end():]
+    if set(expand_pattern(directory, pattern, frames)) != set(paths):
+        return None
+    return directory, pattern
+
+
+def expand_pattern(directory, pattern, frames):
+    """
+    Clip paths back from path_pattern
+    """
+    match = list(hashSearch.finditer(pattern))[-1]
+    return [os.path.join(directory, '{}{:0{}d}{}'.format(pattern[:match.start()], frame, len(match.group()),
+                                                        pattern[match.end():]))
+            for frame in sorted(set(frames))]
+
+
+def paths_info(clip):
+    """
+    Enough info to get the clip paths back later, without keeping thousands of them on every clip node.
+    Sequences named alike keep their directory and a pattern, the frames are in the node's info already.
+    Anything else keeps its paths
+    """
+    pattern = path_pattern(clip.paths, clip.frames)
+    if pattern is None:
+        return {'clip_paths': clip.paths}
+    return {'clip_dir': pattern[0], 'clip_pattern': pattern[1]}
+
+
+def info_paths(info):
+    """
+    A clip node's resolved clip paths, from its info
+    :return: (paths, their frame numbers)
+    """
+    if 'clip_paths' in info:
+        return info['clip_paths'], clip_frames(info['clip_paths'])
+    frames = sorted(set(parse_ranges(info['frames'])))
+    return expand_pattern(info['clip_dir'], info['clip_pattern'], frames), frames
+
+
+def refresh_info(info, stat_cache):
+    """
+    Check a clip node's frames against the disk again, for a scan that came out of a cache
+    :return: the info that changes
+    """
+    paths, frames = info_paths(info)
+    missing = find_missing(paths, frames, stat_cache)
+    return {'online': not missing, 'missing_frames': format_ranges(missing)}
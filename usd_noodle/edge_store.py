@@ -0,0 +1,195 @@
+"""
+Edge storage for the dependency graph
+"""
+import sys
+from collections import OrderedDict
+
+from .path_table import PathTable
+
+# plain dicts keep their order from 3.7 on, at a fraction of OrderedDict's size
+ordered_dict = dict if sys.version_info >= (3, 7) else OrderedDict
+
+# edges are packed into one int: start id, end id and label id, 32 bits each
+_id_bits = 32
+_id_mask = (1 << _id_bits) - 1
+
+
+class EdgeStore(object):
+    """
+    Deduplicated set of (start, end, label) edges.
+    
+    Keeps forward (start -> end) and reverse (end -> start) adjacency,
+    and the usage count of every end node, up to date as edges arrive.
+    Iterating yields the edges in the order they were added.
+    
+    Edges are stored as ids from a PathTable, packed into a single int each,
+    so a path that turns up in thousands of edges is only held once.
+    The edges handed back out are (start, end, label) tuples of the table's paths.
+    
+    With indexed=False only enough is kept to dedupe edges as they stream past.
+    """
+    
+    
+    def __init__(self, indexed=True, paths=None):
+        """
+        :param paths: PathTable to share with the walker
+        """
+        self.indexed = indexed
+        self.paths = paths if paths is not None else PathTable()
+        self.labels = PathTable(normalize=False)
+        self._edges = ordered_dict() if indexed else set()
+        # ids -> packed edges
+        self.forward = {}
+        self.reverse = {}
+        # end id -> number of edges pointing at it
+        self.counts = {}
+    
+    
+    def __len__(self):
+        return len(self._edges)
+    
+    
+    def __iter__(self):
+        for key in self._edges:
+            yield self.unpack(key)
+    
+    
+    def __contains__(self, edge):
+        return self.find(*edge) is not None
+    
+    
+    def pack(self, start, end, label):
+        """
+        :return: the edge as one int, adding its paths to the tables
+        """
+        return ((self.paths.add(start) << (_id_bits * 2)) | (self.paths.add(end) << _id_bits) |
+                self.labels.add(label))
+    
+    
+    def find(self, start, end, label):
+        """
+        :return: the packed edge if it's in the store, or None
+        """
+        start_id = self.paths.get_id(start)
+        end_id = self.paths.get_id(end)
+        label_id = self.labels.get_id(label)
+        if start_id is None or end_id is None or label_id is None:
+            return None
+        key = (start_id << (_id_bits * 2)) | (end_id << _id_bits) | label_id
+        return key if key in self._edges else None
+    
+    
+    def unpack(self, key):
+        return (self.paths.path(key >> (_id_bits * 2)),
+                self.paths.path((key >> _id_bits) & _id_mask),
+                self.labels.path(key & _id_mask))
+    
+    
+    def add(self, start, end, label):
+        """
+        Add an edge
+        :return: True if the edge is new
+        """
+        key = self.pack(start, end, label)
+        if key in self._edges:
+            return False
+        
+        if not self.indexed:
+            self._edges.add(key)
+            return True
+        
+        start_id = key >> (_id_bits * 2)
+        end_id = (key >> _id_bits) & _id_mask
+        self._edges[key] = None
+        self.forward.setdefault(start_id, []).append(key)
+        self.reverse.setdefault(end_id, []).append(key)
+        self.counts[end_id] = self.counts.get(end_id, 0) + 1
+        return True
+    
+    
+    def remove(self, start, end, label):
+        """
+        Remove an edge
+        :return: True if the edge was in the store
+        """
+        key = self.find(start, end, label)
+        if key is None:
+            return False
+        
+        if not self.indexed:
+            self._edges.discard(key)
+            return True
+        
+        start_id = key >> (_id_bits * 2)
+        end_id = (key >> _id_bits) & _id_mask
+        del self._edges[key]
+        self.forward[start_id].remove(key)
+        if not self.forward[start_id]:
+            del self.forward[start_id]
+        self.reverse[end_id].remove(key)
+        if not self.reverse[end_id]:
+            del self.reverse[end_id]
+        self.counts[end_id] -= 1
+        if not self.counts[end_id]:
+            del self.counts[end_id]
+        return True
+    
+    
+    def clear(self):
+        self._edges.clear()
+        self.forward.clear()
+        self.reverse.clear()
+        self.counts.clear()
+    
+    
+    def usage(self, node):
+        """
+        Number of edges pointing at the node
+        """
+        node_id = self.paths.get_id(node)
+        return self.counts.get(node_id, 0) if node_id is not None else 0
+    
+    
+    def usage_counts(self):
+        """
+        (node, usage) for every node with edges pointing at it
+        """
+        for node_id, count in self.counts.items():
+            yield self.paths.path(node_id), count
+    
+    
+    def dependencies(self, node):
+        """
+        Nodes the given node points at, in edge order
+        """
+        node_id = self.paths.get_id(node)
+        ids = OrderedDict(((x >> _id_bits) & _id_mask, None) for x in self.forward.get(node_id, []))
+        return [self.paths.path(x) for x in ids]
+    
+    
+    def dependents(self, node):
+        """
+        Nodes pointing at the given node, in edge order
+        """
+        node_id = self.paths.get_id(node)
+        ids = OrderedDict((x >> (_id_bits * 2), None) for x in self.reverse.get(node_id, []))
+        return [self.paths.path(x) for x in ids]
+    
+    
+    def upstream(self, node):
+        """
+        Everything the node depends on, directly or not.
+        The node itself is not included, unless it's part of a loop
+        """
+        node_id = self.paths.get_id(node)
+        if node_id is None:
+            return set()
+        found = set()
+        to_visit = [node_id]
+        while to_visit:
+            for key in self.forward.get(to_visit.pop(), []):
+                end_id = (key >> _id_bits) & _id_mask
+                if end_id not in found:
+                    found.add(end_id)
+                    to_visit.append(end_id)
+        return set(self.paths.path(x) for x in found)
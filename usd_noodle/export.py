@@ -0,0 +1,254 @@
+"""
+Writes walker graphs to disk as JSON Lines, GraphML, DOT or a csv edge list.
+
+Writers take nodes and edges one at a time, straight from the walk events,
+so a graph never has to be held in memory to be exported
+"""
+import json
+import os.path
+from xml.sax.saxutils import escape, quoteattr
+
+from .walker import NODE_FOUND, EDGE_FOUND, LAYER_FINISHED, plain_value
+
+
+class GraphWriter(object):
+    """
+    Base for the writers. Write nodes and edges as they come, then close
+    """
+    
+    
+    def __init__(self, f):
+        """
+        :param f: file object to write to. it's closed along with the writer
+        """
+        self.f = f
+        self.node_count = 0
+        self.edge_count = 0
+        self.begin()
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    
+    def begin(self):
+        pass
+    
+    
+    def finish(self):
+        pass
+    
+    
+    def node(self, path, info):
+        raise NotImplementedError
+    
+    
+    def edge(self, start, end, label):
+        raise NotImplementedError
+    
+    
+    def layer(self, path, info):
+        """
+        A layer's been scanned. Only the JSON Lines writer has any use for this,
+        the rest have written the node out already
+        """
+        pass
+    
+    
+    def write_event(self, event):
+        """
+        Write a WalkEvent. Can be passed to DependencyWalker.start as its callback
+        """
+        if event.kind == NODE_FOUND:
+            self.node_count += 1
+            self.node(event.path, event.info)
+        elif event.kind == EDGE_FOUND:
+            self.edge_count += 1
+            self.edge(*event.edge)
+        elif event.kind == LAYER_FINISHED:
+            self.layer(event.path, event.info)
+    
+    
+    def close(self):
+        if self.f is None:
+            return
+        self.finish()
+        self.f.close()
+        self.f = None
+
+
+class JsonLinesWriter(GraphWriter):
+    """
+    A json object per line, for nodes, edges and finished layers, in the order the walk found them
+    """
+    
+    
+    def node(self, path, info):
+        self.f.write(json.dumps({'kind': 'node', 'path': path, 'info': plain_value(dict(info or {}))}) + '\n')
+    
+    
+    def edge(self, start, end, label):
+        self.f.write(json.dumps({'kind': 'edge', 'start': start, 'end': end, 'label': label}) + '\n')
+    
+    
+    def layer(self, path, info):
+        self.f.write(json.dumps({'kind': 'layer', 'path': path, 'info': plain_value(dict(info or {}))}) + '\n')
+
+
+class GraphMLWriter(GraphWriter):
+    """
+    GraphML, for yEd, Gephi, networkx and the like
+    """
+    
+    
+    def begin(self):
+        self.f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+        self.f.write('  <key id="type" for="node" attr.name="type" attr.type="string"/>\n')
+        self.f.write('  <key id="online" for="node" attr.name="online" attr.type="boolean"/>\n')
+        self.f.write('  <key id="label" for="edge" attr.name="label" attr.type="string"/>\n')
+        self.f.write('  <graph id="usd" edgedefault="directed">\n')
+    
+    
+    def node(self, path, info):
+        info = info or {}
+        self.f.write('    <node id={}>'.format(quoteattr(path)))
+        if info.get('type') is not None:
+            self.f.write('<data key="type">{}</data>'.format(escape(str(info.get('type')))))
+        if info.get('online') is not None:
+            self.f.write('<data key="online">{}</data>'.format('true' if info.get('online') else 'false'))
+        self.f.write('</node>\n')
+    
+    
+    def edge(self, start, end, label):
+        self.f.write('    <edge source={} target={}><data key="label">{}</data></edge>\n'.format(
+            quoteattr(start), quoteattr(end), escape(str(label))))
+    
+    
+    def finish(self):
+        self.f.write('  </graph>\n')
+        self.f.write('</graphml>\n')
+
+
+def dot_quote(value):
+    return '"{}"'.format(str(value).replace('\\', '\\\\').replace('"', '\\"'))
+
+
+class DotWriter(GraphWriter):
+    """
+    Graphviz dot. Offline files are drawn dashed
+    """
+    
+    
+    def begin(self):
+        self.f.write('digraph usd {\n')
+    
+    
+    def node(self, path, info):
+        info = info or {}
+        attrs = ['type={}'.format(dot_quote(info.get('type', '')))]
+        if info.get('online') is False:
+            attrs.append('style=dashed')
+        self.f.write('  {} [{}];\n'.format(dot_quote(path), ', '.join(attrs)))
+    
+    
+    def edge(self, start, end, label):
+        self.f.write('  {} -> {} [label={}];\n'.format(dot_quote(start), dot_quote(end), dot_quote(label)))
+    
+    
+    def finish(self):
+        self.f.write('}\n')
+
+
+def csv_quote(value):
+    value = str(value)
+    if any(x in value for x in ',"\n\r'):
+        return '"{}"'.format(value.replace('"', '""'))
+    return value
+
+
+class CsvEdgeWriter(GraphWriter):
+    """
+    start,end,label. Edges only, nodes with no edges don't make it in
+    """
+    
+    
+    def begin(self):
+        self.f.write('start,end,label\n')
+    
+    
+    def node(self, path, info):
+        pass
+    
+    
+    def edge(self, start, end, label):
+        self.f.write('{},{},{}\n'.format(csv_quote(start), csv_quote(end), csv_quote(label)))
+
+
+writers = {
+    'jsonl': JsonLinesWriter,
+    'graphml': GraphMLWriter,
+    'dot': DotWriter,
+    'csv': CsvEdgeWriter,
+}
+
+extensions = {
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.graphml': 'graphml',
+    '.dot': 'dot',
+    '.gv': 'dot',
+    '.csv': 'csv',
+}
+
+
+def guess_format(path):
+    """
+    :return: export format going by the file extension, or None
+    """
+    return extensions.get(os.path.splitext(path)[1].lower())
+
+
+def open_writer(path, export_format=None):
+    """
+    :param export_format: one of writers, guessed from the extension if None
+    :return: GraphWriter writing to path
+    """
+    export_format = export_format or guess_format(path)
+    if export_format not in writers:
+        raise ValueError('Unknown export format for {}: {}'.format(path, export_format))
+    return writers[export_format](open(path, 'w'))
+
+
+def export_walk(walker, path, export_format=None):
+    """
+    Walk, writing the graph as it's found.
+    The walker is set to let go of the graph as it goes, so memory stays flat
+    :return: (node count, edge count)
+    """
+    walker.retain_graph = False
+    with open_writer(path, export_format) as writer:
+        for event in walker.walk():
+            writer.write_event(event)
+    return writer.node_count, writer.edge_count
+
+
+def export_graph(nodes, edges, path, export_format=None):
+    """
+    Write a graph that's already been walked
+    :param nodes: dict of path -> info, ie DependencyWalker.nodes
+    :param edges: iterable of (start, end, label)
+    :return: (node count, edge count)
+    """
+    with open_writer(path, export_format) as writer:
+        for node_path, info in nodes.items():
+            writer.node_count += 1
+            writer.node(node_path, info)
+        for edge in edges:
+            writer.edge_count += 1
+            writer.edge(*edge)
+    return writer.node_count, writer.edge_count
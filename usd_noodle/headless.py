@@ -0,0 +1,129 @@
+"""
+Walks a usd file with no ui, and reports what it found.
+Never imports Qt or Nodz, so it starts quickly and doesn't need a display
+"""
+from __future__ import print_function
+import json
+import logging
+import sys
+
+from pxr import Tf
+
+from .walker import DependencyWalker, logger, NODE_FOUND, EDGE_FOUND, LAYER_FINISHED
+from .layer_cache import LayerCache
+from . import export as graph_export
+
+
+def walk(usdfile, walk_attributes=False, workers=1, processes=0, walk_order='depth', use_cache=True,
+         backend='python', scan_mode='full', scope=None, budget=None, export=None, export_format=None,
+         closure=False, resolve_cache=None, layer_cache=None, layer_lru=None, path_table=None):
+    """
+    Walk a usd file, keeping only what the report needs.
+    Nodes are let go of as they're found, so memory stays flat however big the graph gets
+    :param export: file to write the graph to as it's walked, see export.open_writer
+    :param closure: list every node the file depends on in the report, under closure
+    :param resolve_cache, layer_cache, layer_lru, path_table: caches to share with other walks,
+        see DependencyWalker. a layer_cache passed in is left open
+    :return: report dict, see format_report
+    """
+    own_cache = layer_cache is None
+    if own_cache and use_cache:
+        try:
+            layer_cache = LayerCache()
+        except Exception as e:
+            logger.warning('Layer cache unavailable, walking without it: {}'.format(e))
+    
+    x = DependencyWalker(usdfile, resolve_cache=resolve_cache, layer_cache=layer_cache, layer_lru=layer_lru,
+                         path_table=path_table)
+    x.walk_attributes = walk_attributes
+    x.workers = workers
+    x.processes = processes
+    x.walk_order = walk_order
+    x.backend = backend
+    x.scan_mode = scan_mode
+    x.scope = scope
+    x.budget = budget
+    x.retain_graph = False
+    
+    report = {'usdfile': usdfile, 'layers': 0, 'nodes': 0, 'edges': 0, 'offline': [], 'errors': [],
+              'truncated': None}
+    if closure:
+        report['closure'] = []
+    writer = None
+    try:
+        writer = graph_export.open_writer(export, export_format) if export else None
+        try:
+            for event in x.walk():
+                if writer is not None:
+                    writer.write_event(event)
+                if event.kind == NODE_FOUND:
+                    report['nodes'] += 1
+                    if closure:
+                        report['closure'].append(event.path)
+                    if event.info.get('online') is False:
+                        report['offline'].append({'path': event.path, 'type': event.info.get('type')})
+                elif event.kind == EDGE_FOUND:
+                    report['edges'] += 1
+                elif event.kind == LAYER_FINISHED:
+                    report['layers'] += 1
+        except Tf.ErrorException as e:
+            # the root file itself wouldn't open. errors in the layers below it end up in the graph
+            report['errors'].append('{}: {}'.format(usdfile, e))
+        
+        if not report['nodes'] and not report['errors']:
+            # didn't get past opening the file
+            report['errors'].append(usdfile)
+        report['usdfile'] = x.usdfile
+        report['errors'].extend(x.errored_nodes)
+        report['truncated'] = x.truncated
+    finally:
+        if writer is not None:
+            writer.close()
+        if own_cache and layer_cache is not None:
+            layer_cache.close()
+    return report
+
+
+def format_report(report):
+    """
+    The report as text, a line per offline file and per error
+    """
+    lines = [report['usdfile']]
+    lines.append('layers: {}'.format(report['layers']))
+    lines.append('nodes: {}'.format(report['nodes']))
+    lines.append('edges: {}'.format(report['edges']))
+    if report['truncated']:
+        lines.append('truncated: {}'.format(report['truncated']))
+    lines.append('offline: {}'.format(len(report['offline'])))
+    for offline in report['offline']:
+        lines.append('    {} ({})'.format(offline['path'], offline['type']))
+    lines.append('errors: {}'.format(len(report['errors'])))
+    for error in report['errors']:
+        lines.append('    {}'.format(error))
+    return '\n'.join(lines) + '\n'
+
+
+def run(usdfile, output=None, as_json=False, verbose=False, **kwargs):
+    """
+    Walk a usd file and write the report
+    :param output: file to write to, stdout if None
+    :param as_json: write json rather than text
+    :param kwargs: passed on to walk
+    :return: exit code. 1 if there are offline files or errors, 0 if not
+    """
+    if not verbose:
+        logger.setLevel(logging.WARNING)
+    
+    report = walk(usdfile, **kwargs)
+    if as_json:
+        text = json.dumps(report, indent=2) + '\n'
+    else:
+        text = format_report(report)
+    
+    if output:
+        with open(output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    
+    return 1 if report['offline'] or report['errors'] else 0
@@ -7,6 +7,8 @@ from functools import partial
 from Qt import QtWidgets, QtCore, QtWidgets, QtGui
 from pxr import Usd, Sdf, Ar, UsdUtils
 
+from .stat_cache import get_stat_cache
+
 
 left_pad = 80
 
@@ -308,6 +310,10 @@ class InfoPanel(QtWidgets.QWidget):
         super(InfoPanel, self).__init__(parent)
         
         self.usdfile = None
+        # the graph's EdgeStore, set by whoever loads the graph
+        self.edges = None
+        # shared with the walker, so the files it's just looked at don't get stat'ed again
+        self.stat_cache = get_stat_cache()
         
         self.build_ui()
     
@@ -342,7 +348,7 @@ class InfoPanel(QtWidgets.QWidget):
         self.verticalLayout.addItem(spacer)
     
     
-    def loadData(self, usdfile, info):
+    def loadData(self, usdfile, info, node_name=None):
         if self.visibleRegion().isEmpty():
             # dont bother updating if the widget can't be seen
             return
@@ -354,17 +360,30 @@ class InfoPanel(QtWidgets.QWidget):
         self.usdfile = usdfile
         
         self.attrLayout.addWidget(StringAttrEdit('Name', os.path.basename(self.usdfile), readOnly=True))
-        self.attrLayout.addWidget(StringAttrEdit('Usage', info.get("count", 0), readOnly=True))
+        if self.edges is not None and node_name:
+            self.attrLayout.addWidget(StringAttrEdit('Usage', self.edges.usage(node_name), readOnly=True))
+            used_by = [os.path.basename(x) for x in self.edges.dependents(node_name)]
+            if used_by:
+                self.attrLayout.addWidget(ListAttrEdit('Used By', used_by, readOnly=True))
+        else:
+            self.attrLayout.addWidget(StringAttrEdit('Usage', info.get("count", 0), readOnly=True))
         
         # some node types don't represent files
         non_file_nodes = ['clip', 'variant', 'material']
         if not info.get("type") in non_file_nodes:
-            file_online = os.path.isfile(self.usdfile)
+            if 'tiles' in info:
+                # tiled textures don't have a single file to look at
+                file_online = info.get('online')
+                file_size = info.get('size', 0)
+            else:
+                file_stat = self.stat_cache.stat(self.usdfile)
+                file_online = file_stat is not None and file_stat.is_file
+                file_size = file_stat.size if file_online else 0
             self.attrLayout.addWidget(BoolAttrEdit('Online', file_online, readOnly=True))
             
             if file_online:
                 self.attrLayout.addWidget(
-                    StringAttrEdit('Size', '{:.2f}mb'.format(os.path.getsize(self.usdfile) / 1024.0 / 1024.0),
+                    StringAttrEdit('Size', '{:.2f}mb'.format(file_size / 1024.0 / 1024.0),
                                    readOnly=True)
                 )
             
@@ -406,9 +425,20 @@ class InfoPanel(QtWidgets.QWidget):
         if info.get("type") == 'tex':
             self.attrLayout.addWidget(StringAttrEdit('colorspace', info.get("colorspace"), readOnly=True))
         
+        if 'tiles' in info:
+            self.attrLayout.addWidget(StringAttrEdit(info.get("tile_kind"), info.get("tile_range"), readOnly=True))
+            self.attrLayout.addWidget(StringAttrEdit('tiles', info.get("tiles"), readOnly=True))
+            if info.get("missing_tiles"):
+                self.attrLayout.addWidget(StringAttrEdit('missing tiles', info.get("missing_tiles"),
+                                                         readOnly=True))
+        
         if info.get("type") == 'clip':
             self.attrLayout.addWidget(StringAttrEdit('clipSet', info.get("clipSet"), readOnly=True))
             self.attrLayout.addWidget(StringAttrEdit('primPath', info.get("primPath"), readOnly=True))
+            self.attrLayout.addWidget(StringAttrEdit('frames', info.get("frames"), readOnly=True))
+            if info.get("missing_frames"):
+                self.attrLayout.addWidget(StringAttrEdit('missing frames', info.get("missing_frames"),
+                                                         readOnly=True))
         
         elif info.get("type") == 'sublayer':
             self.attrLayout.addWidget(StringAttrEdit('specifier', info.get("specifier"), readOnly=True))
@@ -0,0 +1,297 @@
+"""
+Persistent on-disk cache of layer scans, so unchanged layers don't get opened again
+"""
+import getpass
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import stat
+import tempfile
+import threading
+
+logger = logging.getLogger('usd-noodle')
+
+
+def default_cache_dir():
+    """
+    A directory on this machine's own disk. Home directories are often on a network filesystem,
+    and sqlite's WAL mode doesn't work on those, so ~/.cache is only used if XDG_CACHE_HOME says so.
+    Otherwise it's a directory of our own in the temp directory, see private_dir
+    """
+    if os.name == 'nt':
+        return os.path.join(os.environ.get('LOCALAPPDATA') or tempfile.gettempdir(), 'usd_noodle')
+    if os.environ.get('XDG_CACHE_HOME'):
+        return os.path.join(os.environ['XDG_CACHE_HOME'], 'usd_noodle')
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = str(os.getuid())
+    return os.path.join(tempfile.gettempdir(), 'usd_noodle-{}'.format(user))
+
+
+def private_dir(path):
+    """
+    Make a directory only we can get into, or check that the one that's there is.
+    The temp directory is shared, and anyone could have made ours first and left scans in it for us to read.
+    One of ours that others can only read, made before this was checked, is closed off
+    :raises: OSError if it belongs to someone else, or other users can write to it
+    """
+    try:
+        os.makedirs(path, 0o700)
+    except OSError:
+        # already there, or someone else got there first
+        if not os.path.isdir(path):
+            raise
+    if os.name == 'nt':
+        return
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o022:
+        raise OSError('{} is not a private directory of ours, not keeping a cache in it'.format(path))
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+
+
+def default_cache_path():
+    """
+    Where the cache lives unless told otherwise. USD_NOODLE_CACHE overrides it
+    """
+    path = os.environ.get('USD_NOODLE_CACHE')
+    if path:
+        return path
+    return os.path.join(default_cache_dir(), 'layer_cache.sqlite')
+
+
+def file_signature(path, hash_contents=False):
+    """
+    What a file on disk looks like right now
+    :return: (mtime, size, hash) or None if the file can't be read
+    """
+    try:
+        st = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    digest = None
+    if hash_contents:
+        sha = hashlib.sha1()
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    sha.update(chunk)
+        except (IOError, OSError):
+            return None
+        digest = sha.hexdigest()
+    return st.st_mtime, st.st_size, digest
+
+
+class LayerCache(object):
+    """
+    SQLite store of LayerScans, keyed on the resolved layer path and the walker settings.
+    
+    A cached scan is only handed back while the layer's mtime and size still match
+    the ones it was scanned with (and its content hash, with hash_contents on),
+    so a hit costs a stat rather than opening the layer.
+    
+    Several noodles can share the same file: each thread gets its own connection,
+    and writers wait on each other. Scans are stored as json rather than pickled,
+    so whatever is in the file, reading it can't run anything.
+    The default cache is on local disk and runs in WAL mode. One put somewhere else on purpose
+    might be on a network filesystem, where WAL doesn't work, so it gets the rollback journal.
+    """
+    
+    
+    def __init__(self, db_path=None, hash_contents=False, timeout=30.0, wal=None):
+        """
+        :param wal: use WAL mode. by default only for the default cache path
+        """
+        if wal is None:
+            wal = not db_path and not os.environ.get('USD_NOODLE_CACHE')
+        self.db_path = db_path or default_cache_path()
+        self.hash_contents = hash_contents
+        self.timeout = timeout
+        self.wal = wal
+        
+        self._local = threading.local()
+        
+        self.hits = 0
+        self.misses = 0
+        
+        db_dir = os.path.dirname(self.db_path)
+        if not db_path and not os.environ.get('USD_NOODLE_CACHE'):
+            private_dir(db_dir)
+        elif db_dir and not os.path.isdir(db_dir):
+            try:
+                os.makedirs(db_dir)
+            except OSError:
+                # someone else got there first
+                if not os.path.isdir(db_dir):
+                    raise
+        
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS layers ('
+                         'path TEXT NOT NULL, '
+                         'settings TEXT NOT NULL, '
+                         'mtime REAL NOT NULL, '
+                         'size INTEGER NOT NULL, '
+                         'hash TEXT, '
+                         'scan BLOB NOT NULL, '
+                         'PRIMARY KEY (path, settings))')
+    
+    
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode={}'.format('WAL' if self.wal else 'DELETE'))
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    
+    def signature(self, layer_path):
+        return file_signature(layer_path, self.hash_contents)
+    
+    
+    def get(self, layer_path, settings, signature):
+        """
+        :param layer_path: resolved layer path
+        :param settings: string keys of the walker settings the scan could have been stored under,
+            the first one with an up to date scan wins
+        :param signature: current signature() of the layer
+        :return: the cached LayerScan, or None if there isn't an up to date one
+        """
+        if signature is None:
+            return None
+        try:
+            rows = self._connect().execute('SELECT settings, mtime, size, hash, scan FROM layers '
+                                           'WHERE path = ? AND settings IN ({})'.format(', '.join('?' * len(settings))),
+                                           [layer_path] + list(settings)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning('layer cache lookup failed: {}'.format(e))
+            rows = []
+        
+        by_settings = dict((x[0], x[1:]) for x in rows)
+        row = None
+        for key in settings:
+            if key in by_settings and tuple(by_settings[key][:3]) == tuple(signature):
+                row = by_settings[key]
+                break
+        if row is None:
+            self.misses += 1
+            return None
+        
+        # the walker imports us, so it's only imported once there's a scan to read
+        from .walker import LayerScan
+        try:
+            scan = LayerScan.from_json(row[3])
+        except Exception as e:
+            logger.warning('layer cache entry for {} is unreadable: {}'.format(layer_path, e))
+            self.misses += 1
+            return None
+        self.hits += 1
+        return scan
+    
+    
+    def put(self, scan, settings, signature):
+        """
+        Store a scan, along with the signature the layer had before it was scanned
+        """
+        if signature is None or scan.error:
+            return
+        blob = scan.to_json()
+        try:
+            with self._connect() as conn:
+                conn.execute('INSERT OR REPLACE INTO layers (path, settings, mtime, size, hash, scan) '
+                             'VALUES (?, ?, ?, ?, ?, ?)',
+                             (scan.path, settings, signature[0], signature[1], signature[2], blob))
+        except sqlite3.Error as e:
+            # not worth failing a walk over
+            logger.warning('layer cache write failed: {}'.format(e))
+    
+    
+    def evict(self, layer_path=None):
+        """
+        Drop cached scans
+        :param layer_path: only drop this layer. everything if None
+        """
+        with self._connect() as conn:
+            if layer_path is None:
+                conn.execute('DELETE FROM layers')
+            else:
+                conn.execute('DELETE FROM layers WHERE path = ?', (layer_path,))
+    
+    
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class MemoryLayerCache(object):
+    """
+    LayerCache that lives in memory, for sharing scans between walkers in the one process
+    without touching the disk. Thread safe
+    """
+    
+    
+    def __init__(self, hash_contents=False):
+        self.hash_contents = hash_contents
+        # (path, settings) -> (signature, pickled scan)
+        self._scans = {}
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    
+    def __len__(self):
+        return len(self._scans)
+    
+    
+    def signature(self, layer_path):
+        return file_signature(layer_path, self.hash_contents)
+    
+    
+    def get(self, layer_path, settings, signature):
+        if signature is None:
+            return None
+        entries = [self._scans.get((layer_path, x)) for x in settings]
+        entry = next((x for x in entries if x is not None and x[0] == signature), None)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # kept pickled, so every walker gets a copy of its own to fill in
+        return pickle.loads(entry[1])
+    
+    
+    def put(self, scan, settings, signature):
+        if signature is None or scan.error:
+            return
+        blob = pickle.dumps(scan, 2)
+        with self._lock:
+            self._scans[(scan.path, settings)] = (signature, blob)
+    
+    
+    def evict(self, layer_path=None):
+        with self._lock:
+            if layer_path is None:
+                self._scans.clear()
+            else:
+                for key in [x for x in self._scans if x[0] == layer_path]:
+                    del self._scans[key]
+    
+    
+    def close(self):
+        pass
+    
+    
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,101 @@
+"""
+Keeps the layers the walker opened, up to a memory cap, and lets go of the rest
+"""
+import threading
+from collections import OrderedDict
+
+from pxr import Sdf
+
+
+class LayerLRU(object):
+    """
+    The Sdf.Layers the walker opened itself, least recently used first.
+    
+    Layers stay in the layer registry for as long as something holds on to them.
+    This holds on to at most max_bytes worth, going by their size on disk,
+    and drops the oldest past that. With max_bytes at 0 every layer is let go
+    as soon as it's been scanned.
+    
+    Layers that were already open when the walker got to them belong to someone else,
+    a Houdini session's stages for instance. Those are used as they are, and are never held or let go of here.
+    """
+    
+    
+    def __init__(self, max_bytes=0, stat_cache=None):
+        self.max_bytes = max_bytes
+        self.stat_cache = stat_cache
+        # layer path -> (layer, size)
+        self._layers = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        
+        self.hits = 0
+        self.opened = 0
+        self.foreign = 0
+        self.released = 0
+    
+    
+    def __len__(self):
+        return len(self._layers)
+    
+    
+    def open(self, layer_path):
+        """
+        Find or open a layer, holding on to it if we were the ones who opened it
+        :raises: Tf.ErrorException if the layer can't be read
+        """
+        with self._lock:
+            held = self._layers.pop(layer_path, None)
+            if held is not None:
+                # back to the most recently used end
+                self._layers[layer_path] = held
+                self.hits += 1
+                return held[0]
+        
+        layer = Sdf.Layer.Find(layer_path)
+        if layer:
+            with self._lock:
+                self.foreign += 1
+            return layer
+        
+        layer = Sdf.Layer.FindOrOpen(layer_path)
+        if not layer:
+            return layer
+        with self._lock:
+            held = self._layers.get(layer_path)
+            if held is not None:
+                # another thread opened it at the same time, and got it in first
+                self.hits += 1
+                return held[0]
+            self.opened += 1
+            if self.max_bytes <= 0:
+                self.released += 1
+                return layer
+            size = self.stat_cache.getsize(layer_path) if self.stat_cache is not None else 0
+            self._layers[layer_path] = (layer, size)
+            self.size += size
+            while self.size > self.max_bytes and self._layers:
+                self.size -= self._layers.popitem(last=False)[1][1]
+                self.released += 1
+        return layer
+    
+    
+    def release(self, layer_path=None):
+        """
+        Let go of a layer, or every layer if None
+        """
+        with self._lock:
+            if layer_path is None:
+                self.released += len(self._layers)
+                self._layers.clear()
+                self.size = 0
+                return
+            held = self._layers.pop(layer_path, None)
+            if held is not None:
+                self.size -= held[1]
+                self.released += 1
+    
+    
+    def stats(self):
+        return {'held': len(self._layers), 'size': self.size, 'hits': self.hits, 'opened': self.opened,
+                'foreign': self.foreign, 'released': self.released}
@@ -0,0 +1,70 @@
+"""
+How much memory the process is using, so walks can say what they cost
+"""
+import os
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def current_rss():
+    """
+    :return: resident memory of this process in bytes, or None if there's no way to tell
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, AttributeError):
+        return None
+
+
+def format_bytes(size):
+    if size is None:
+        return '?'
+    for unit in ['B', 'KB', 'MB']:
+        if abs(size) < 1024:
+            return '{:.1f} {}'.format(size, unit)
+        size /= 1024.0
+    return '{:.1f} GB'.format(size)
+
+
+class MemoryTracker(object):
+    """
+    Samples resident memory over a walk.
+    peak is the most it got to, retained is how much more there is at the end than at the start
+    """
+    
+    
+    def __init__(self):
+        self.start_rss = None
+        self.peak_rss = None
+        self.end_rss = None
+    
+    
+    def start(self):
+        self.start_rss = self.peak_rss = current_rss()
+        self.end_rss = None
+    
+    
+    def sample(self):
+        rss = current_rss()
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+        return rss
+    
+    
+    def stop(self):
+        self.end_rss = self.sample()
+    
+    
+    def stats(self):
+        retained = None
+        peak = None
+        if self.start_rss is not None and self.end_rss is not None:
+            retained = self.end_rss - self.start_rss
+            peak = self.peak_rss - self.start_rss
+        return {'start': self.start_rss, 'peak': peak, 'retained': retained, 'rss': self.end_rss}
@@ -0,0 +1,201 @@
+"""
+Interned, numbered paths, and the compact node records that point at them
+"""
+import os
+import threading
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+try:
+    from sys import intern
+except ImportError:
+    pass
+
+
+def normalize_path(path):
+    """
+    The one spelling of a path that's safe to settle on: forward slashes, on windows.
+    Anything else, case or escapes included, could change which file is meant
+    """
+    if os.sep == '\\':
+        return path.replace('\\', '/')
+    return path
+
+
+class PathTable(object):
+    """
+    Every path in a graph, interned once, and given an integer id.
+    
+    However many layers point at the same file, the graph only holds one copy of its path,
+    and edges can be stored as ids rather than strings.
+    Paths are never removed, so an id stays good for as long as the table is around.
+    """
+    
+    
+    def __init__(self, normalize=True):
+        """
+        :param normalize: run paths through normalize_path before interning them.
+            the spelling they came in with still finds the same id
+        """
+        self.normalize = normalize
+        # path, as normalized or as it came in -> id
+        self._ids = {}
+        # id -> normalized path
+        self._paths = []
+        self._lock = threading.Lock()
+    
+    
+    def __len__(self):
+        return len(self._paths)
+    
+    
+    def __contains__(self, path):
+        return self.get_id(path) is not None
+    
+    
+    def add(self, path):
+        """
+        :return: id of the path, adding it if it's new
+        """
+        path_id = self._ids.get(path)
+        if path_id is not None:
+            return path_id
+        
+        with self._lock:
+            given = path
+            if self.normalize and path is not None:
+                path = normalize_path(path)
+            try:
+                path = intern(path)
+            except TypeError:
+                # py2 only interns byte strings
+                pass
+            path_id = self._ids.get(path)
+            if path_id is None:
+                path_id = len(self._paths)
+                self._paths.append(path)
+                self._ids[path] = path_id
+            self._ids[given] = path_id
+        return path_id
+    
+    
+    def get_id(self, path):
+        """
+        :return: id of the path, or None if it isn't in the table
+        """
+        path_id = self._ids.get(path)
+        if path_id is None and self.normalize and path is not None:
+            path_id = self._ids.get(normalize_path(path))
+        return path_id
+    
+    
+    def path(self, path_id):
+        return self._paths[path_id]
+    
+    
+    def intern(self, path):
+        """
+        :return: the table's own copy of the path, normalized
+        """
+        return self._paths[self.add(path)]
+
+
+# node info keys that every node has, and get a slot of their own
+node_fields = ('path', 'type', 'online', 'count')
+
+
+class NodeInfo(MutableMapping):
+    """
+    A node's info. Reads and writes like the info dicts scans are made of,
+    but the keys every node has live in slots, and the rest in a dict that's only made when needed
+    """
+    __slots__ = ['id', 'path', 'type', 'online', 'count', '_extra']
+    
+    
+    def __init__(self, path_id=None, info=None):
+        """
+        :param path_id: id of the node's path in the walker's PathTable
+        :param info: info dict to copy
+        """
+        self.id = path_id
+        self._extra = None
+        if info:
+            self.update(info)
+    
+    
+    def __getitem__(self, key):
+        if key in node_fields:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+    
+    
+    def __setitem__(self, key, value):
+        if key in node_fields:
+            setattr(self, key, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+    
+    
+    def __delitem__(self, key):
+        if key in node_fields:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+            return
+        if self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+        if not self._extra:
+            self._extra = None
+    
+    
+    def __contains__(self, key):
+        if key in node_fields:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+    
+    
+    def __iter__(self):
+        for key in node_fields:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            for key in list(self._extra):
+                yield key
+    
+    
+    def __len__(self):
+        return sum(1 for x in self)
+    
+    
+    def __repr__(self):
+        return 'NodeInfo({!r})'.format(dict(self.items()))
+    
+    
+    def get(self, key, default=None):
+        if key in node_fields:
+            return getattr(self, key, default)
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+    
+    
+    def __getstate__(self):
+        return self.id, dict(self.items())
+    
+    
+    def __setstate__(self, state):
+        self.id = state[0]
+        self._extra = None
+        self.update(state[1])
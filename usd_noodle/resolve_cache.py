@@ -0,0 +1,119 @@
+"""
+Memoized asset path resolution for the dependency walker
+"""
+import os.path
+import threading
+
+from pxr import Ar, Sdf
+
+
+def needs_context(path):
+    """
+    Whether resolving an authored asset path can depend on the resolver context.
+    Anchored paths, ./ and ../, and absolute ones come out the same whatever the context.
+    Search paths, and anything else the resolver might make something of, don't
+    """
+    if path.startswith(('./', '../', '.\\', '..\\')):
+        return False
+    return not os.path.isabs(path)
+
+
+class ResolveCache(object):
+    """
+    Resolves asset paths anchored to a layer, without opening a stage.
+    
+    Results are keyed on (anchoring layer identifier, asset path, resolver context),
+    so each distinct path is only ever handed to the resolver once.
+    The context is left out for paths that don't depend on it, see needs_context,
+    so walks from roots in different directories share those.
+    """
+    
+    
+    def __init__(self, resolver=None):
+        self.resolver = resolver or Ar.GetResolver()
+        
+        self._cache = {}
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    
+    def __len__(self):
+        return len(self._cache)
+    
+    
+    def anchor(self, anchor_path, path):
+        """
+        Anchor an asset path to a layer path, for layers that were opened anonymously
+        and can't anchor anything themselves
+        """
+        if hasattr(self.resolver, 'CreateIdentifier'):
+            return self.resolver.CreateIdentifier(path, Ar.ResolvedPath(anchor_path))
+        # ar 1.0
+        if self.resolver.IsRelativePath(path):
+            return self.resolver.AnchorRelativePath(anchor_path, path)
+        return path
+    
+    
+    def resolve(self, layer, path, context=None, anchor_path=None):
+        """
+        Resolve an authored asset path relative to the layer it was authored in
+        :param layer: anchoring Sdf.Layer
+        :param path: asset path as authored
+        :param context: Ar.ResolverContext to bind while resolving
+        :param anchor_path: path to anchor to instead of the layer's own, when it's anonymous
+        :return: resolved path, or the anchored path if it can't be resolved
+        """
+        key = (anchor_path or layer.identifier, path, context if needs_context(path) else None)
+        resolved = self._cache.get(key)
+        if resolved is not None:
+            with self._lock:
+                self.hits += 1
+            return resolved
+        
+        if anchor_path:
+            anchored = self.anchor(anchor_path, path)
+        else:
+            anchored = Sdf.ComputeAssetPathRelativeToLayer(layer, path)
+        if context is not None:
+            with Ar.ResolverContextBinder(context):
+                resolved = self.resolver.Resolve(anchored)
+        else:
+            resolved = self.resolver.Resolve(anchored)
+        
+        if resolved:
+            resolved = resolved.GetPathString()
+        else:
+            # resolver will return an empty path on missing files
+            # we still want the path regardless
+            resolved = anchored
+        
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = resolved
+        return resolved
+    
+    
+    def evict(self, layer_identifier=None):
+        """
+        Drop cached results
+        :param layer_identifier: only drop paths anchored to this layer. everything if None
+        """
+        with self._lock:
+            if layer_identifier is None:
+                self._cache.clear()
+                return
+            for key in [x for x in self._cache if x[0] == layer_identifier]:
+                del self._cache[key]
+    
+    
+    def clear(self):
+        self.evict()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+    
+    
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache)}
@@ -0,0 +1,111 @@
+"""
+What a walk is allowed to look at: include/exclude rules on dependencies, and budgets
+that stop a walk that's getting out of hand
+"""
+import fnmatch
+import re
+import time
+
+
+class ScopeRules(object):
+    """
+    Include/exclude rules on the resolved paths and types of dependencies.
+    
+    Path rules are globs, matched against the whole resolved path, or regexes
+    searched for in it when they start with re:
+        */library/*
+        re:/shared/textures/.*\\.tx$
+    Type rules are node types: sublayer, reference, payload, clip, variant, material, tex, ext
+    
+    Excludes win. With any includes, a dependency has to match one of them as well.
+    """
+    
+    
+    def __init__(self, include=None, exclude=None, include_types=None, exclude_types=None):
+        self.include = [self.compile(x) for x in include or []]
+        self.exclude = [self.compile(x) for x in exclude or []]
+        self.include_types = set(include_types or [])
+        self.exclude_types = set(exclude_types or [])
+    
+    
+    def __bool__(self):
+        return bool(self.include or self.exclude or self.include_types or self.exclude_types)
+    
+    __nonzero__ = __bool__
+    
+    
+    @staticmethod
+    def compile(rule):
+        """
+        :return: compiled regex for a glob or re: rule
+        """
+        if rule.startswith('re:'):
+            return re.compile(rule[3:])
+        # globs have to match the whole path
+        return re.compile('^' + fnmatch.translate(rule))
+    
+    
+    def allows_type(self, dep_type):
+        if dep_type in self.exclude_types:
+            return False
+        return not self.include_types or dep_type in self.include_types
+    
+    
+    def allows_path(self, path):
+        path = path.replace('\\', '/')
+        if any(x.search(path) for x in self.exclude):
+            return False
+        return not self.include or any(x.search(path) for x in self.include)
+    
+    
+    def allows(self, path, dep_type):
+        """
+        :param path: resolved path of the dependency
+        :param dep_type: its node type
+        """
+        return self.allows_type(dep_type) and self.allows_path(path)
+
+
+class WalkBudget(object):
+    """
+    Hard limits on a walk. 0 is no limit.
+    Checked between layers, so the graph is never left with half a layer in it.
+    Counts go from start(), so expanding a collapsed layer gets a budget of its own
+    """
+    
+    
+    def __init__(self, max_layers=0, max_nodes=0, max_seconds=0):
+        self.max_layers = max_layers
+        self.max_nodes = max_nodes
+        self.max_seconds = max_seconds
+        self.started = None
+        self.start_nodes = 0
+    
+    
+    def __bool__(self):
+        return bool(self.max_layers or self.max_nodes or self.max_seconds)
+    
+    __nonzero__ = __bool__
+    
+    
+    def start(self, node_count=0):
+        """
+        :param node_count: nodes already in the graph, which don't count against max_nodes
+        """
+        self.started = time.time()
+        self.start_nodes = node_count
+    
+    
+    def exceeded(self, layer_count, node_count):
+        """
+        :param layer_count: layers walked since start
+        :param node_count: nodes in the graph
+        :return: which limit has been hit, or None
+        """
+        if self.max_layers and layer_count >= self.max_layers:
+            return 'max layers ({})'.format(self.max_layers)
+        if self.max_nodes and node_count - self.start_nodes >= self.max_nodes:
+            return 'max nodes ({})'.format(self.max_nodes)
+        if self.max_seconds and self.started is not None and time.time() - self.started >= self.max_seconds:
+            return 'max seconds ({})'.format(self.max_seconds)
+        return None
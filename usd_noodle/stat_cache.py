@@ -0,0 +1,163 @@
+"""
+Cached, directory-at-a-time file stats, shared by the walker and the ui
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+try:
+    from os import scandir
+except ImportError:
+    scandir = None
+
+FileStat = namedtuple('FileStat', ['path', 'is_file', 'size', 'mtime'])
+
+
+class _Entry(object):
+    """
+    A directory entry from a listing. The full stat is only fetched when size or mtime are asked for
+    """
+    __slots__ = ['path', 'is_file', '_dir_entry', '_stat']
+    
+    
+    def __init__(self, path, is_file, dir_entry=None, stat=None):
+        self.path = path
+        self.is_file = is_file
+        self._dir_entry = dir_entry
+        self._stat = stat
+    
+    
+    def stat(self):
+        if self._stat is None:
+            try:
+                self._stat = self._dir_entry.stat() if self._dir_entry is not None else os.stat(self.path)
+            except OSError:
+                return None
+            self._dir_entry = None
+        return self._stat
+
+
+class StatCache(object):
+    """
+    Answers "is this a file, how big is it, when did it change" a whole directory at a time.
+    
+    The first question about a path lists its directory once, and everything else in
+    that directory is answered from the listing until it's ttl seconds old.
+    Missing directories are remembered too, so offline paths don't cost a round trip each.
+    Size and mtime cost a stat of their own, but only the first time they're asked for.
+    """
+    
+    
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        # directory -> (time listed, {normcased name: _Entry}), or None for missing directories
+        self._listings = {}
+        self._lock = threading.Lock()
+        
+        self.listings = 0
+        self.hits = 0
+    
+    
+    def listing(self, directory):
+        """
+        :return: {name: _Entry} for the directory, or None if it doesn't exist.
+            names are keyed through os.path.normcase, so look them up the same way
+        """
+        now = time.time()
+        cached = self._listings.get(directory)
+        if cached is not None and now - cached[0] < self.ttl:
+            self.hits += 1
+            return cached[1]
+        
+        entries = None
+        try:
+            entries = {}
+            if scandir is not None:
+                for dir_entry in scandir(directory or '.'):
+                    try:
+                        is_file = dir_entry.is_file()
+                    except OSError:
+                        is_file = False
+                    entries[os.path.normcase(dir_entry.name)] = _Entry(dir_entry.path, is_file, dir_entry=dir_entry)
+            else:
+                for name in os.listdir(directory or '.'):
+                    path = os.path.join(directory, name)
+                    entries[os.path.normcase(name)] = _Entry(path, os.path.isfile(path))
+        except OSError:
+            # not there, or not a directory. remember that as well
+            entries = None
+        
+        with self._lock:
+            self.listings += 1
+            self._listings[directory] = (now, entries)
+        return entries
+    
+    
+    def _entry(self, path):
+        directory, name = os.path.split(path)
+        entries = self.listing(directory)
+        if entries is None:
+            return None
+        return entries.get(os.path.normcase(name))
+    
+    
+    def isfile(self, path):
+        entry = self._entry(path)
+        return entry is not None and entry.is_file
+    
+    
+    def exists(self, path):
+        return self._entry(path) is not None
+    
+    
+    def stat(self, path):
+        """
+        :return: FileStat, or None if there's nothing there
+        """
+        entry = self._entry(path)
+        if entry is None:
+            return None
+        st = entry.stat()
+        if st is None:
+            return None
+        return FileStat(path, entry.is_file, st.st_size, st.st_mtime)
+    
+    
+    def getsize(self, path):
+        st = self.stat(path)
+        return st.size if st else 0
+    
+    
+    def invalidate(self, path=None):
+        """
+        Forget what we know
+        :param path: forget the directory holding this file, or this directory. everything if None
+        """
+        with self._lock:
+            if path is None:
+                self._listings.clear()
+                return
+            self._listings.pop(path, None)
+            self._listings.pop(os.path.dirname(path), None)
+    
+    
+    def clear(self):
+        self.invalidate()
+    
+    
+    def stats(self):
+        return {'listings': self.listings, 'hits': self.hits, 'directories': len(self._listings)}
+
+
+_stat_cache = None
+
+
+def get_stat_cache():
+    """
+    The StatCache everything in this process shares, unless told otherwise
+    """
+    global _stat_cache
+    if _stat_cache is None:
+        _stat_cache = StatCache()
+    return _stat_cache
@@ -0,0 +1,145 @@
+"""
+Tiled and sequenced textures: <UDIM>, <UVTILE>, $F and #### style paths,
+checked against one directory listing instead of a stat per tile
+"""
+import os.path
+import re
+
+from .clips import format_ranges
+
+# token -> (regex for what it expands to, kind of tile it is)
+tile_tokens = [
+    (re.compile(r'<udim>', re.IGNORECASE), r'(\d{4})', 'udim'),
+    (re.compile(r'<uvtile>', re.IGNORECASE), r'(u\d+_v\d+)', 'uvtile'),
+    (re.compile(r'\$F(\d*)'), None, 'frame'),
+    (re.compile(r'%0?(\d*)d'), None, 'frame'),
+    (re.compile(r'#+'), None, 'frame'),
+]
+
+
+class TextureSequence(object):
+    """
+    What a tiled or sequenced texture looks like on disk
+    """
+    __slots__ = ['path', 'kind', 'tiles', 'missing', 'size']
+    
+    
+    def __init__(self, path, kind):
+        self.path = path
+        # udim, uvtile or frame
+        self.kind = kind
+        # tile numbers found on disk. uvtiles get numbered like udims
+        self.tiles = []
+        # gaps. frames between the first and last, tiles in the grid of used columns and rows
+        self.missing = []
+        # total bytes of every tile
+        self.size = 0
+
+
+def _frame_pattern(match):
+    token = match.group(0)
+    if token.startswith('#'):
+        return r'(\d{%d,})' % len(token)
+    padding = match.group(1)
+    if padding:
+        return r'(\d{%d,})' % int(padding)
+    return r'(\d+)'
+
+
+def tile_pattern(path):
+    """
+    :return: (compiled regex matching the tiles' file names, kind) or None if the path isn't tiled.
+    only tokens in the file name count
+    """
+    basename = os.path.basename(path)
+    for token, expansion, kind in tile_tokens:
+        match = token.search(basename)
+        if not match:
+            continue
+        if expansion is None:
+            expansion = _frame_pattern(match)
+        pattern = re.escape(basename[:match.start()]) + expansion + re.escape(basename[match.end():])
+        return re.compile('^' + pattern + '$'), kind
+    return None
+
+
+def tile_number(tile, kind):
+    if kind == 'uvtile':
+        # mari style u1_v1, 1 based
+        u, v = tile[1:].split('_v')
+        return 1001 + (int(u) - 1) + 10 * (int(v) - 1)
+    return int(tile)
+
+
+def scan_texture(path, stat_cache):
+    """
+    Find the tiles of a texture path with a tile token in it
+    :param path: resolved texture path, token and all
+    :param stat_cache: StatCache to list the directory with
+    :return: TextureSequence or None if the path isn't tiled
+    """
+    pattern = tile_pattern(path)
+    if pattern is None:
+        return None
+    regex, kind = pattern
+    
+    sequence = TextureSequence(path, kind)
+    entries = stat_cache.listing(os.path.dirname(path)) or {}
+    for entry in entries.values():
+        # the listing's keys are normcased, the entry's path has the name as it is on disk
+        match = regex.match(os.path.basename(entry.path))
+        if not match or not entry.is_file:
+            continue
+        sequence.tiles.append(tile_number(match.group(1), kind))
+        st = entry.stat()
+        if st is not None:
+            sequence.size += st.st_size
+    sequence.tiles.sort()
+    
+    sequence.missing = missing_tiles(sequence.tiles, kind)
+    return sequence
+
+
+def tile_paths(path, stat_cache):
+    """
+    The files on disk behind a tiled or sequenced texture path
+    :param stat_cache: StatCache to list the directory with
+    :return: sorted file paths, or None if the path isn't tiled
+    """
+    pattern = tile_pattern(path)
+    if pattern is None:
+        return None
+    entries = stat_cache.listing(os.path.dirname(path)) or {}
+    return sorted(x.path for x in entries.values() if x.is_file and pattern[0].match(os.path.basename(x.path)))
+
+
+def missing_tiles(tiles, kind):
+    """
+    :param tiles: sorted tile numbers found on disk
+    :return: gaps in the sequence. frames are missing if they're between the first and last.
+        udims only count as missing inside the grid of columns and rows that have tiles,
+        so 1001, 1002 and 1011 are missing 1012, not 1003-1010
+    """
+    if not tiles:
+        return []
+    found = set(tiles)
+    if kind == 'frame':
+        return [x for x in range(tiles[0], tiles[-1] + 1) if x not in found]
+    columns = sorted(set((x - 1001) % 10 for x in tiles))
+    rows = sorted(set((x - 1001) // 10 for x in tiles))
+    grid = sorted(1001 + u + 10 * v for v in rows for u in columns)
+    return [x for x in grid if x not in found]
+
+
+def sequence_info(sequence):
+    """
+    Node info for a TextureSequence
+    """
+    info = {}
+    info['online'] = bool(sequence.tiles)
+    info['tile_kind'] = sequence.kind
+    info['tiles'] = len(sequence.tiles)
+    info['tile_range'] = format_ranges(sequence.tiles)
+    info['missing_tiles'] = format_ranges(sequence.missing)
+    info['size'] = sequence.size
+    return info
@@ -1,4 +1,5 @@
 import os.path
+import re
 
 
 escape_dict = {
@@ -26,15 +27,14 @@ escape_dict = {
 }
 
 
+# only single characters can turn up in a string, the rest of escape_dict never matches
+raw_search = re.compile('|'.join(re.escape(x) for x in escape_dict if len(x) == 1))
+
+
 def raw(text):
     """Returns a raw string representation of text"""
-    new_string = r''
-    for char in text:
-        try:
-            new_string += escape_dict[char]
-        except KeyError:
-            new_string += char
-    return new_string
+    # one pass in c, and nothing to build at all for the usual string with nothing to escape
+    return raw_search.sub(lambda match: escape_dict[match.group(0)], text)
 
 
 def sanitize_path(in_path):
@@ -0,0 +1,1124 @@
+"""
+Walks the layers, references and payloads of a usd file and builds a dependency graph.
+Doesn't need Qt, so it can run headless or in worker processes
+"""
+from __future__ import print_function
+import json
+import logging
+import os.path
+import copy
+import heapq
+import threading
+import multiprocessing
+from collections import OrderedDict, deque, namedtuple
+from functools import partial
+from multiprocessing.pool import ThreadPool
+
+from pxr import Sdf, Ar, Tf
+
+from .resolve_cache import ResolveCache, needs_context
+from . import clips, textures
+from .edge_store import EdgeStore
+from .path_table import PathTable, NodeInfo
+from .layer_cache import file_signature
+from .layer_lru import LayerLRU
+from .memory import MemoryTracker, format_bytes
+from .stat_cache import get_stat_cache
+
+
+logger = logging.getLogger('usd-noodle')
+logger.setLevel(logging.INFO)
+if not len(logger.handlers):
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    # fh = logging.FileHandler('/tmp/usd-noodle/test.log')
+    # fh.setLevel(logging.DEBUG)
+    logger.addHandler(ch)
+    # logger.addHandler(fh)
+logger.propagate = False
+
+# walk events, see DependencyWalker.walk
+NODE_FOUND = 'node'
+EDGE_FOUND = 'edge'
+LAYER_FINISHED = 'layer'
+
+# node and layer events carry path and info, edge events carry a (start, end, label) edge
+WalkEvent = namedtuple('WalkEvent', ['kind', 'path', 'info', 'edge'])
+
+try:
+    string_types = (str, unicode)
+except NameError:
+    string_types = (str,)
+
+
+def plain_value(value):
+    """
+    Convert layer metadata into plain python types, so scans can be pickled
+    """
+    if value is None or isinstance(value, (bool, int, float) + string_types):
+        return value
+    if isinstance(value, dict):
+        return dict((str(k), plain_value(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return [plain_value(x) for x in value]
+    return str(value)
+
+
+# what goes into a LayerScan. bump it whenever that changes,
+# so scans cached by an older build aren't handed to this one
+scan_version = 6
+
+
+class LayerScan(object):
+    """
+    Everything a single layer contributes to the graph.
+    Scans are built without touching the walker, and merged in walk order
+    """
+    __slots__ = ['path', 'header', 'nodes', 'edges', 'children', 'error', 'uses_context']
+    
+    
+    def __init__(self, path):
+        self.path = path
+        # info from the layer's pseudo root, for the layer's own node
+        self.header = None
+        # (path, info) pairs
+        self.nodes = []
+        # (start, end, label, type) tuples. type is the node type of the dependency
+        # the edge brings in, which scope type rules are checked against
+        self.edges = []
+        # layers to walk next
+        self.children = []
+        self.error = False
+        # whether any of the layer's asset paths were resolved through the resolver context,
+        # if not the scan is cached without it
+        self.uses_context = False
+    
+    
+    def __getstate__(self):
+        return tuple(getattr(self, x) for x in self.__slots__)
+    
+    
+    def __setstate__(self, state):
+        for key, value in zip(self.__slots__, state):
+            setattr(self, key, value)
+    
+    
+    def to_json(self):
+        """
+        The scan as json, for the layer cache. Unlike a pickle, reading it back can't run anything
+        """
+        return json.dumps(self.__getstate__())
+    
+    
+    @classmethod
+    def from_json(cls, text):
+        scan = cls.__new__(cls)
+        scan.__setstate__(json.loads(text))
+        # json has no tuples
+        scan.nodes = [tuple(x) for x in scan.nodes]
+        scan.edges = [tuple(x) for x in scan.edges]
+        return scan
+
+
+class WalkQueue(object):
+    """
+    Work queue of (layer path, level) pairs for the walker.
+    
+    depth: depth first, in the order dependencies were found. what a recursive walk would do
+    breadth: breadth first, level by level
+    priority: lowest priority_key(layer_path, level) first
+    """
+    orders = ['depth', 'breadth', 'priority']
+    
+    
+    def __init__(self, order='depth', priority_key=None):
+        if order not in self.orders:
+            raise ValueError('Unknown walk order: {}'.format(order))
+        self.order = order
+        self.priority_key = priority_key
+        self._items = deque()
+        self._heap = []
+        self._count = 0
+    
+    
+    def __len__(self):
+        return len(self._heap) if self.order == 'priority' else len(self._items)
+    
+    
+    def extend(self, layer_paths, level):
+        if self.order == 'priority':
+            for layer_path in layer_paths:
+                # the counter keeps equal priorities in the order they were found
+                heapq.heappush(self._heap, (self.priority_key(layer_path, level), self._count, layer_path, level))
+                self._count += 1
+        elif self.order == 'depth':
+            # reversed, so the first dependency comes off the stack first
+            self._items.extend((x, level) for x in reversed(layer_paths))
+        else:
+            self._items.extend((x, level) for x in layer_paths)
+    
+    
+    def pop(self):
+        if self.order == 'priority':
+            return heapq.heappop(self._heap)[2:]
+        elif self.order == 'depth':
+            return self._items.pop()
+        return self._items.popleft()
+
+
+# dependency types in the order the priority walk gets to them
+type_priority = {'sublayer': 0, 'reference': 1, 'payload': 2}
+
+
+class DependencyWalker(object):
+    # scan_layer hands each layer to scan_layer_<backend>
+    # python: everything found by visiting the layer's specs in python
+    # native: arcs found by UsdUtils.ExtractExternalReferences, the rest in python
+    backends = ['python', 'native']
+    # how much of each layer gets looked at
+    # full: everything the backend finds
+    # structure: the layer stack and composition arcs. no attributes or clips, and no attribute values get read
+    # stack: just the layer stack, from metadata only reads of each layer where the file format allows it
+    scan_modes = ['full', 'structure', 'stack']
+    
+    
+    def __init__(self, usdfile, resolve_cache=None, layer_cache=None, stat_cache=None, layer_lru=None,
+                 path_table=None):
+        self.usdfile = usdfile
+        self.walk_attributes = True
+        # how layers get scanned, see backends and scan_modes
+        self.backend = 'python'
+        self.scan_mode = 'full'
+        # number of threads used to open and scan layers. 1 walks serially
+        self.workers = 1
+        # number of worker processes used to scan layers. 0 doesn't use any.
+        # takes over from workers, as the python side of the scan is GIL bound
+        self.processes = 0
+        self._pool = None
+        self._pending = {}
+        # see WalkQueue
+        self.walk_order = 'depth'
+        # key function for the priority walk order, called with (layer path, level)
+        self.priority_key = self.type_priority_key
+        # keep the whole graph in nodes and edges.
+        # when streaming events somewhere else, turn this off so nodes are let go
+        # once they've been handed out, and edges are only kept for deduping
+        self.retain_graph = True
+        
+        # every path in the graph is interned once here.
+        # nodes are keyed on the table's copy, and edges are stored as its ids
+        self.paths = path_table if path_table is not None else PathTable()
+        # path -> NodeInfo
+        self.nodes = {}
+        self.edges = EdgeStore(paths=self.paths)
+        # nodes let go of when not retaining the graph
+        self.released_nodes = set()
+        
+        self.resolver = Ar.GetResolver()
+        self.resolver_context = None
+        # resolved paths can be shared between walkers
+        # as the cache is keyed on the resolver context where it matters
+        self.resolve_cache = resolve_cache if resolve_cache is not None else ResolveCache(self.resolver)
+        # online checks go through a StatCache, a directory listing at a time
+        self.stat_cache = stat_cache or get_stat_cache()
+        # optional LayerCache, so unchanged layers don't need opening again
+        self.layer_cache = layer_cache
+        # layers get opened through a LayerLRU, which decides how many of them stay open.
+        # by default they're let go as soon as they've been scanned
+        self.layer_lru = layer_lru if layer_lru is not None else LayerLRU(stat_cache=self.stat_cache)
+        # resident memory over the last walk, see memory_stats
+        self.memory = MemoryTracker()
+        self._cached = {}
+        self._signatures = {}
+        # hang on to every layer's scan and the signature it was scanned with,
+        # so the next walk can reuse the ones that haven't changed. see previous_scans
+        self.keep_scans = False
+        self.scans = {}
+        # scans kept by an earlier walk of the same file
+        self.previous_scans = {}
+        # layers that had to be scanned again, rather than coming from a cache
+        self.rescanned = []
+        
+        # layers that have been walked, or are being walked
+        self.visited_nodes = set()
+        # how many levels of layers to walk. 0 walks everything.
+        # layers past that are left collapsed, and can be walked later with expand()
+        self.max_depth = 0
+        self.collapsed = set()
+        # collapsed layers that have been expanded since. max_depth starts again below them
+        self.expanded = set()
+        
+        # optional ScopeRules. dependencies they leave out aren't added to the graph,
+        # and layers they leave out are never opened
+        self.scope = None
+        self.excluded_nodes = set()
+        # optional WalkBudget. running out of it stops the walk between layers,
+        # leaving the layers still to walk collapsed, and says why in truncated
+        self.budget = None
+        self.truncated = None
+        
+        self.errored_nodes = []
+        
+        self._cancel = threading.Event()
+    
+    
+    def cancel(self):
+        """
+        Stop the walk before the next layer. Safe to call from any thread.
+        Whatever has been found so far stays in the graph
+        """
+        self._cancel.set()
+    
+    
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+    
+    
+    def start(self, callback=None):
+        """
+        Walk the usd file, building up nodes and edges
+        :param callback: optional function, called with each WalkEvent as it happens
+        """
+        for event in self.walk():
+            if callback:
+                callback(event)
+    
+    
+    def walk(self):
+        """
+        Walk the usd file, yielding WalkEvents as nodes and edges are found
+        and layers are finished with
+        """
+        logger.info('DependencyWalker'.center(40, '-'))
+        logger.info('Loading usd file: {}'.format(self.usdfile))
+        
+        self.visited_nodes = set()
+        self.nodes = {}
+        self.edges = EdgeStore(indexed=self.retain_graph, paths=self.paths)
+        self.released_nodes = set()
+        self.init_edges = []
+        self.collapsed = set()
+        self.excluded_nodes = set()
+        self.scans = {}
+        self.rescanned = []
+        
+        layer = Sdf.Layer.FindOrOpen(self.usdfile)
+        if not layer:
+            return
+        
+        # scrub the initial file path
+        # to get around upper/lowercase drive letters
+        # and junk like that
+        layer_path = Sdf.ComputeAssetPathRelativeToLayer(layer, os.path.basename(self.usdfile))
+        
+        layer_path = self.paths.intern(layer_path)
+        self.usdfile = layer_path
+        
+        # this is the context a stage opened on the root file would get
+        self.resolver_context = self.resolver.CreateDefaultContextForAsset(layer.identifier)
+        
+        info = {}
+        info['online'] = self.stat_cache.isfile(layer_path)
+        info['path'] = layer_path
+        info['type'] = 'sublayer'
+        yield WalkEvent(NODE_FOUND, layer_path, self.add_node(layer_path, info), None)
+        
+        for event in self.walk_with_pool(layer_path):
+            yield event
+        
+        if self.excluded_nodes:
+            logger.info('{} dependencies out of scope'.format(len(self.excluded_nodes)))
+        logger.info('resolve cache: {hits} hits, {misses} misses'.format(**self.resolve_cache.stats()))
+        if self.layer_cache is not None:
+            logger.info('layer cache: {hits} hits, {misses} misses'.format(**self.layer_cache.stats()))
+        logger.info('stat cache: {listings} directory listings, {hits} hits'.format(**self.stat_cache.stats()))
+    
+    
+    def expand(self, layer_path):
+        """
+        Walk a layer that was left collapsed, and max_depth levels below it.
+        Carries on from the last walk, so only new nodes and edges come out
+        :return: generator of WalkEvents
+        """
+        logger.info('Expanding: {}'.format(layer_path))
+        self._cancel.clear()
+        self.expanded.add(layer_path)
+        for event in self.walk_with_pool(layer_path):
+            yield event
+    
+    
+    def walk_with_pool(self, layer_path):
+        """
+        walk_layers, with the worker pool set up around it
+        """
+        self.truncated = None
+        if self.budget:
+            self.budget.start(len(self.nodes) + len(self.released_nodes))
+        self.memory.start()
+        if self.processes > 0:
+            self._pool = multiprocessing.Pool(self.processes, initializer=_init_scan_process,
+                                              initargs=(self.usdfile, self.worker_settings()))
+        elif self.workers > 1:
+            self._pool = ThreadPool(self.workers)
+        try:
+            for event in self.walk_layers(layer_path):
+                yield event
+        finally:
+            if self._pool is not None:
+                # anything still pending was reached some other way first
+                self._pool.terminate()
+                self._pool = None
+            self._pending = {}
+            self._cached = {}
+            self._signatures = {}
+            self.memory.stop()
+            logger.info('memory: peak {}, retained {}, {} layers held ({})'.format(
+                format_bytes(self.memory_stats()['peak']), format_bytes(self.memory_stats()['retained']),
+                len(self.layer_lru), format_bytes(self.layer_lru.size)))
+        
+        # the edge store keeps usage counts as the edges come in
+        if self.retain_graph:
+            for node, count in self.edges.usage_counts():
+                if node in self.nodes:
+                    self.nodes[node]['count'] = count
+    
+    
+    def memory_stats(self):
+        """
+        How much more resident memory the last walk got up to, and was left using, in bytes.
+        Both are None where there's no way to tell
+        """
+        stats = self.memory.stats()
+        stats['layers_held'] = len(self.layer_lru)
+        stats['layers_size'] = self.layer_lru.size
+        return stats
+    
+    
+    def iter_specs(self, prim_spec):
+        """
+        Every prim spec from prim_spec down, each one once, in namespace order.
+        Specs are handed out as they're reached, nothing gets collected up front
+        """
+        to_visit = [prim_spec]
+        while to_visit:
+            spec = to_visit.pop()
+            yield spec
+            # reversed, so the children come back out in namespace order
+            to_visit.extend(reversed(list(spec.nameChildren.values())))
+    
+    
+    def flatten_ref_list(self, ref_or_payload):
+        ret = []
+        for itemlist in [ref_or_payload.appendedItems, ref_or_payload.explicitItems, ref_or_payload.addedItems,
+                         ref_or_payload.prependedItems, ref_or_payload.orderedItems]:
+            for payload in itemlist:
+                ret.append(payload)
+        return list(OrderedDict.fromkeys(ret))
+    
+    
+    def resolve(self, scan, layer, path, anchor_path=None):
+        """
+        Resolve an asset path authored in the scan's layer, noting whether the resolver context had a say
+        """
+        if needs_context(path):
+            scan.uses_context = True
+        return self.resolve_cache.resolve(layer, path, self.resolver_context, anchor_path=anchor_path)
+    
+    
+    def add_node(self, path, info):
+        """
+        Add a node, unless it's already in the graph.
+        The first arrival wins, so later arrivals don't throw away
+        anything that walking the layer has already found out
+        :param path: node path, from the path table
+        :param info: info dict, copied into the node's NodeInfo
+        :return: the node's NodeInfo, or None if it's been released
+        """
+        if path in self.nodes or path in self.released_nodes:
+            return self.nodes.get(path)
+        node = NodeInfo(self.paths.add(path), info)
+        if node.get('path') is not None:
+            node['path'] = self.paths.intern(node['path'])
+        self.nodes[path] = node
+        return node
+    
+    
+    def release_node(self, path):
+        """
+        Let go of a node's info when not retaining the graph.
+        It still counts as found, so it won't be handed out again
+        """
+        if self.retain_graph:
+            return
+        self.nodes.pop(path, None)
+        self.released_nodes.add(path)
+    
+    
+    def scan_layer(self, layer_path):
+        """
+        Open a layer and collect the nodes and edges it contributes.
+        This doesn't touch the walker's graph, so it's safe to run on worker threads
+        :param layer_path: resolved layer path
+        :return: LayerScan
+        """
+        scan = LayerScan(layer_path)
+        
+        try:
+            if self.scan_mode == 'stack':
+                # only the layer's own metadata gets read in, no prims.
+                # comes back anonymous, so isn't kept around in the layer registry either
+                layer = Sdf.Layer.OpenAsAnonymous(layer_path, True)
+            else:
+                layer = self.layer_lru.open(layer_path)
+        except Tf.ErrorException as e:
+            scan.error = True
+            return scan
+        
+        if not layer:
+            return scan
+        
+        scan.header = self.layer_header(layer)
+        if self.scan_mode == 'stack':
+            scan.header['muted'] = layer_path in Sdf.Layer.GetMutedLayers()
+            self.scan_sublayers(scan, layer, [], [])
+        elif self.scan_mode == 'structure':
+            self.scan_layer_structure(scan, layer)
+        else:
+            getattr(self, 'scan_layer_{}'.format(self.backend))(scan, layer)
+        return scan
+    
+    
+    def layer_header(self, layer):
+        """
+        Info for the layer's own node
+        """
+        root = layer.pseudoRoot
+        
+        # info packet from the root prim
+        info_dict = dict()
+        for key in root.ListInfoKeys():
+            if key in ['subLayers', 'subLayerOffsets']:
+                continue
+            info_dict[key] = plain_value(root.GetInfo(key))
+        
+        info = {}
+        info['info'] = info_dict
+        info['specifier'] = root.specifier.displayName
+        info['muted'] = layer.IsMuted()
+        info['defaultPrim'] = layer.defaultPrim
+        info['PseudoRoot'] = layer.pseudoRoot.name
+        info['RootPrims'] = [x.path.GetPrimPath().pathString for x in layer.rootPrims]
+        return info
+    
+    
+    def scan_layer_python(self, scan, layer):
+        layer_path = scan.path
+        payloads = []
+        references = []
+        
+        for child in self.iter_specs(layer.pseudoRoot):
+            # print(id, child)
+            if self.walk_attributes:
+                self.scan_attributes(scan, layer, child)
+            self.scan_clips(scan, layer, child)
+            self.scan_variants(scan, layer, child, payloads, references)
+            self.scan_arcs(scan, layer, child, layer_path, None, payloads, references)
+        
+        self.scan_sublayers(scan, layer, references, payloads)
+    
+    
+    def scan_layer_structure(self, scan, layer):
+        """
+        Composition arcs only. Specs are visited for their arc and variant metadata,
+        attributes are left alone
+        """
+        layer_path = scan.path
+        payloads = []
+        references = []
+        
+        for child in self.iter_specs(layer.pseudoRoot):
+            self.scan_variants(scan, layer, child, payloads, references)
+            self.scan_arcs(scan, layer, child, layer_path, None, payloads, references)
+        
+        self.scan_sublayers(scan, layer, references, payloads)
+    
+    
+    def scan_layer_native(self, scan, layer):
+        """
+        References and payloads come from UsdUtils.ExtractExternalReferences, which finds them in c++.
+        Python still visits the specs for what that can't tell us: variants, asset attributes
+        and their materials, and clips.
+        
+        The c++ results lump asset attributes and clips in with references, one copy of each path.
+        Paths without a usd file format are left out, those are left to scan_attributes and scan_clips.
+        Asset attributes pointing at usd files are only looked for on the python visit when there are
+        usd files among the references. Those and clip paths can't be told apart from a reference
+        to the same file, and neither can arcs in variants, as every variant's arcs are in the c++ results
+        and they don't say where anything was authored. Layers with either of those get their arcs
+        from the python scan instead
+        """
+        layer_path = scan.path
+        payloads = []
+        references = []
+        
+        # only imported when it's needed, it drags the whole of Usd in with it
+        from pxr import UsdUtils
+        sublayer_paths, reference_paths, payload_paths = UsdUtils.ExtractExternalReferences(layer.identifier)
+        reference_paths = [x for x in reference_paths if x and Sdf.FileFormat.FindByExtension(x)]
+        
+        in_variants = set()
+        in_clips = set()
+        in_attributes = set()
+        for child in self.iter_specs(layer.pseudoRoot):
+            if self.walk_attributes:
+                self.scan_attributes(scan, layer, child)
+            if reference_paths:
+                in_attributes.update(self.asset_attribute_paths(child))
+            self.scan_clips(scan, layer, child)
+            for clip_set in child.GetInfo("clips").values():
+                in_clips.update(clips.clip_asset_paths(clip_set))
+                manifest = clip_set.get("manifestAssetPath")
+                if manifest:
+                    in_clips.add(manifest.path)
+            if child.variantSets:
+                self.scan_variants(scan, layer, child, payloads, references)
+                for varset in child.variantSets:
+                    for variant in varset.variants.values():
+                        for variant_spec in self.iter_specs(variant.primSpec):
+                            if reference_paths:
+                                in_attributes.update(self.asset_attribute_paths(variant_spec))
+                            for arc in self.flatten_ref_list(variant_spec.payloadList):
+                                in_variants.add(arc.assetPath)
+                            for arc in self.flatten_ref_list(variant_spec.referenceList):
+                                in_variants.add(arc.assetPath)
+        
+        # attributes and clips aren't arcs, but the same path could be a reference too
+        not_arcs = in_attributes | in_clips
+        if in_variants or not_arcs.intersection(reference_paths):
+            for child in self.iter_specs(layer.pseudoRoot):
+                self.scan_arcs(scan, layer, child, layer_path, None, payloads, references)
+        else:
+            for asset_path in payload_paths:
+                if asset_path:
+                    self.add_arc(scan, layer, asset_path, layer_path, 'payload', 'payload', payloads)
+            for asset_path in reference_paths:
+                if asset_path not in not_arcs:
+                    self.add_arc(scan, layer, asset_path, layer_path, 'reference', 'reference', references)
+        
+        self.scan_sublayers(scan, layer, references, payloads)
+    
+    
+    @staticmethod
+    def asset_attribute_paths(spec):
+        """
+        Asset paths authored as the defaults of a spec's asset attributes
+        """
+        paths = []
+        for attr in spec.attributes:
+            if attr.typeName == 'asset':
+                if attr.default and attr.default.path:
+                    paths.append(attr.default.path)
+            elif attr.typeName == 'asset[]' and attr.default:
+                paths.extend(x.path for x in attr.default if x.path)
+        return paths
+    
+    
+    def scan_sublayers(self, scan, layer, references, payloads):
+        """
+        Sublayers, and the order everything found gets walked in
+        """
+        # layers opened metadata only are anonymous, and get anchored to where they came from
+        anchor_path = scan.path if layer.anonymous else None
+        sublayers = []
+        for rel_sublayer in layer.subLayerPaths:
+            refpath = self.resolve(scan, layer, rel_sublayer, anchor_path=anchor_path)
+            sublayers.append(refpath)
+            
+            info = {}
+            info['online'] = self.stat_cache.isfile(refpath)
+            info['path'] = refpath
+            info['type'] = 'sublayer'
+            scan.nodes.append((refpath, info))
+            
+            scan.edges.append((scan.path, refpath, 'sublayer', 'sublayer'))
+        
+        # sublayers get walked first, then references, then payloads
+        scan.children = list(OrderedDict.fromkeys(sublayers + references + payloads))
+    
+    
+    def scan_attributes(self, scan, layer, spec):
+        """
+        Asset valued attributes on a prim spec: textures and other external files
+        """
+        layer_path = scan.path
+        attributes = spec.attributes
+        for attr in attributes:
+            # we are looking for "asset" type attributes
+            # references to external things
+            if attr.typeName == 'asset':
+                value = attr.default
+                # sometimes you get empty paths
+                if not value:
+                    continue
+                if not value.path:
+                    continue
+                
+                resolved_path = self.resolve(scan, layer, value.path)
+                info = {}
+                # udim and frame tokens make one node for the whole sequence
+                sequence = textures.scan_texture(resolved_path, self.stat_cache)
+                if sequence is not None:
+                    info = textures.sequence_info(sequence)
+                else:
+                    info['online'] = self.stat_cache.isfile(resolved_path)
+                info['path'] = resolved_path
+                filebase, ext = os.path.splitext(resolved_path)
+                info['type'] = 'ext'
+                if ext in ['.jpg', '.tex', '.tx', '.png', '.exr', '.hdr', '.tga', '.tif', '.tiff',
+                           '.pic', '.gif', '.psd', '.ptex', '.cin', '.dpx', '.bmp', '.iff',
+                           '.mov', '.m4v', '.mp4', '.webp']:
+                    info['type'] = 'tex'
+                    info['colorspace'] = attr.colorSpace
+                
+                scan.nodes.append((resolved_path, info))
+                
+                # so, we want to find out if this attribute is inside a shader
+                # it's conceivable that asset attrs could exist outside of shaders
+                # i just havent seen that in the wild yet
+                # crawl through the ancestors - ie Material -> Shader -> Attribute
+                owner = attr.owner
+                owner_type = owner.typeName
+                if owner_type == 'Shader':
+                    owner_parent = owner.nameParent
+                    if owner_parent.typeName == 'Material':
+                        material_path = '{}:{}'.format(os.path.splitext(layer.realPath)[0], owner_parent.name)
+                        material_info = {}
+                        material_info['online'] = True
+                        material_info['path'] = material_path
+                        material_info['type'] = 'material'
+                        
+                        scan.nodes.append((material_path, material_info))
+                        
+                        # connect the material to the layer
+                        scan.edges.append((layer_path, material_path, 'materials', 'material'))
+                        
+                        # then connect the file to the material
+                        scan.edges.append((material_path, resolved_path, owner.name, info['type']))
+                        
+                        continue
+                
+                # finally, if it doesn't smell like a material
+                # then just set up a regular connectio to the layer
+                scan.edges.append((layer_path, resolved_path, info['type'], info['type']))
+    
+    
+    def scan_clips(self, scan, layer, spec):
+        layer_path = scan.path
+        clip_info = spec.GetInfo("clips")
+        # pprint(clip_info)
+        for clip_set_name in clip_info:
+            clip_set = clip_info[clip_set_name]
+            # print(clip_set_name, clip_set.get("assetPaths"), clip_set.get("manifestAssetPath"), clip_set.get()
+            #     "primPath")
+            
+            clip = clips.scan_clip_set(layer, clip_set, partial(self.resolve, scan), self.stat_cache)
+            if clip is None:
+                continue
+            
+            info = {}
+            info['online'] = not clip.missing
+            info['path'] = clip.path
+            info['type'] = 'clip'
+            info['primPath'] = clip_set.get("primPath")
+            info['clipSet'] = clip_set_name
+            info['frames'] = clips.format_ranges(clip.frames)
+            info['missing_frames'] = clips.format_ranges(clip.missing)
+            # so a cached scan can check the frames again
+            info.update(clips.paths_info(clip))
+            
+            scan.nodes.append((clip.name, info))
+            
+            scan.edges.append((layer_path, clip.name, 'clip', 'clip'))
+            
+            # manifests are optional
+            manifestPath = clip_set.get("manifestAssetPath")
+            if manifestPath and manifestPath.path:
+                clipmanifest_path = self.resolve(scan, layer, manifestPath.path)
+                scan.edges.append((clip.name, clipmanifest_path, 'manifest', 'clip'))
+    
+    
+    def scan_variants(self, scan, layer, spec, payloads, references):
+        """
+        Variant sets on a prim spec, and the arcs in their current selections
+        """
+        layer_path = scan.path
+        if spec.variantSets:
+            for varset in spec.variantSets:
+                # print(child, 'variant set', varset.name)
+                variant_path = '{}:{}'.format(os.path.splitext(layer.realPath)[0], varset.name)
+                varprim = varset.owner
+                
+                info = {}
+                info['online'] = True
+                info['path'] = variant_path
+                info['type'] = 'variant'
+                info['variant_set'] = varset.name
+                info['variants'] = [str(x) for x in varset.variants.keys()]
+                
+                info['current_variant'] = varprim.variantSelections.get(varset.name)
+                
+                scan.nodes.append((variant_path, info))
+                
+                scan.edges.append((layer_path, variant_path, 'variant', 'variant'))
+                
+                for variant_name in varset.variants.keys():
+                    variant = varset.variants[variant_name]
+                    
+                    # so variants can host payloads and references
+                    # we get to these through the variants primspec
+                    # and then add them to our list of paths to inspect
+                    if variant_name != info.get('current_variant'):
+                        continue
+                    for primspec_child in self.iter_specs(variant.primSpec):
+                        self.scan_arcs(scan, layer, primspec_child, variant_path, variant_name, payloads, references)
+    
+    
+    def scan_arcs(self, scan, layer, spec, from_node, label, payloads, references):
+        """
+        Payloads and references on a prim spec
+        :param from_node: node the arcs hang off. the layer, or the variant they're authored in
+        :param label: edge label, if not the arc type
+        :param payloads: list the resolved payload paths are added to
+        :param references: list the resolved reference paths are added to
+        """
+        payloadList = self.flatten_ref_list(spec.payloadList)
+        for payload in payloadList:
+            pathToResolve = payload.assetPath
+            if pathToResolve:
+                self.add_arc(scan, layer, pathToResolve, from_node, 'payload', label or 'payload', payloads)
+        
+        referenceList = self.flatten_ref_list(spec.referenceList)
+        for reference in referenceList:
+            pathToResolve = reference.assetPath
+            if pathToResolve:
+                self.add_arc(scan, layer, pathToResolve, from_node, 'reference', label or 'reference', references)
+    
+    
+    def add_arc(self, scan, layer, asset_path, from_node, arc_type, label, found):
+        """
+        Node and edge for a payload or reference
+        :param found: list the resolved path is added to
+        """
+        refpath = self.resolve(scan, layer, asset_path)
+        found.append(refpath)
+        
+        info = {}
+        info['online'] = self.stat_cache.isfile(refpath)
+        info['path'] = refpath
+        info['type'] = arc_type
+        
+        scan.nodes.append((refpath, info))
+        
+        scan.edges.append((from_node, refpath, label, arc_type))
+    
+    
+    def in_graph(self, path):
+        return path in self.nodes or path in self.released_nodes
+    
+    
+    def in_scope(self, path, dep_type):
+        """
+        Check a dependency, brought in by an arc of the given type, against the scope rules.
+        A path that's ruled out stays out, but type rules go arc by arc:
+        a layer that one arc type can't bring in can still be reached by another
+        """
+        if path in self.excluded_nodes:
+            return False
+        if not self.scope:
+            return True
+        if not self.in_graph(path) and not self.scope.allows_path(path):
+            self.excluded_nodes.add(path)
+            return False
+        return self.scope.allows_type(dep_type)
+    
+    
+    def merge_scan(self, scan):
+        """
+        Add the nodes and edges from a LayerScan to the graph.
+        Scans are kept whole, so they can be cached whatever the scope, and trimmed to it here
+        :return: (WalkEvents for everything that was new,
+                  set of paths the layer's in scope arcs lead to)
+        """
+        events = []
+        reached = set()
+        if scan.error:
+            info = self.add_node(scan.path, {'path': scan.path})
+            if info is None:
+                # found as something other than a layer first, and let go of already.
+                # the error still needs a node to go out with
+                info = NodeInfo(self.paths.add(scan.path), {'path': scan.path})
+            info['online'] = True
+            info['error'] = True
+            self.errored_nodes.append(scan.path)
+            logger.info('usd file: {} had load errors'.format(scan.path))
+            events.append(WalkEvent(LAYER_FINISHED, scan.path, info, None))
+            return events, reached
+        
+        if scan.header and scan.path in self.nodes:
+            self.nodes[scan.path].update(scan.header)
+        # edges hang off nodes in the graph, or ones this layer's own edges got to, by arcs the scope allows.
+        # edges come after the ones that lead to where they start, so one pass does
+        edges = []
+        for start, end, label, dep_type in scan.edges:
+            edge = (self.paths.intern(start), self.paths.intern(end), label)
+            if not (self.in_graph(edge[0]) or edge[0] in reached) or not self.in_scope(edge[1], dep_type):
+                continue
+            reached.add(edge[1])
+            edges.append(edge)
+        # and only nodes those edges get to go in, so an arc that's ruled out doesn't leave any orphans
+        for path, info in scan.nodes:
+            path = self.paths.intern(path)
+            if path not in reached or self.in_graph(path):
+                continue
+            events.append(WalkEvent(NODE_FOUND, path, self.add_node(path, info), None))
+        for edge in edges:
+            if self.edges.add(*edge):
+                events.append(WalkEvent(EDGE_FOUND, None, None, edge))
+        events.append(WalkEvent(LAYER_FINISHED, scan.path, self.nodes.get(scan.path), None))
+        return events, reached
+    
+    
+    def scan_layers(self, layer_paths):
+        return [self.scan_layer(x) for x in layer_paths]
+    
+    
+    def worker_settings(self):
+        """
+        Settings that worker processes need to scan layers the same way we do
+        """
+        return {'walk_attributes': self.walk_attributes, 'backend': self.backend, 'scan_mode': self.scan_mode}
+    
+    
+    def cache_settings(self, context=True):
+        """
+        Key for the settings a cached scan depends on
+        :param context: include the resolver context. scans that didn't use it are stored without,
+            so walks of roots in other directories can share them
+        """
+        return repr((scan_version, sorted(self.worker_settings().items()),
+                     repr(self.resolver_context) if context else None))
+    
+    
+    def layer_signature(self, layer_path):
+        if self.layer_cache is not None:
+            return self.layer_cache.signature(layer_path)
+        return file_signature(layer_path)
+    
+    
+    def load_cached(self, layer_path):
+        """
+        Look the layer up in the previous walk's scans, then the layer cache
+        :return: True if there's an up to date scan for it
+        """
+        if layer_path in self._cached:
+            return True
+        if self.layer_cache is None and not self.keep_scans:
+            return False
+        signature = self.layer_signature(layer_path)
+        
+        scan = None
+        previous = self.previous_scans.get(layer_path)
+        if previous is not None and signature is not None and previous[0] == signature:
+            # the earlier walk's nodes are still out there being used,
+            # this walk gets its own
+            scan = copy.deepcopy(previous[1])
+        elif self.layer_cache is not None:
+            scan = self.layer_cache.get(layer_path, [self.cache_settings(context=False), self.cache_settings()],
+                                        signature)
+        if scan is None:
+            # keep the signature from before the scan,
+            # so a change made while scanning isn't missed next time
+            self._signatures[layer_path] = signature
+            return False
+        
+        # the layer hasn't changed, but the files it points at might have come and gone
+        for path, info in scan.nodes:
+            if 'tiles' in info:
+                sequence = textures.scan_texture(path, self.stat_cache)
+                info.update(textures.sequence_info(sequence))
+            elif info.get('type') in ['sublayer', 'reference', 'payload', 'tex', 'ext']:
+                info['online'] = self.stat_cache.isfile(path)
+            elif info.get('type') == 'clip':
+                info.update(clips.refresh_info(info, self.stat_cache))
+        self._cached[layer_path] = scan
+        if self.keep_scans:
+            self.scans[layer_path] = (signature, scan)
+        return True
+    
+    
+    def store_scan(self, scan):
+        self.rescanned.append(scan.path)
+        if scan.path not in self._signatures:
+            return
+        signature = self._signatures.pop(scan.path)
+        if self.keep_scans and not scan.error:
+            self.scans[scan.path] = (signature, scan)
+        if self.layer_cache is not None:
+            self.layer_cache.put(scan, self.cache_settings(context=scan.uses_context), signature)
+    
+    
+    def prefetch(self, layer_paths):
+        """
+        Queue layers up to be scanned on the worker pool, if there is one
+        """
+        if self._pool is None:
+            return
+        layer_paths = [x for x in layer_paths if x not in self._pending and not self.load_cached(x)]
+        
+        chunk_size = 1
+        if self.processes > 0:
+            # hand layers to the processes in batches,
+            # so we're not paying for a round trip per layer
+            chunk_size = max(1, len(layer_paths) // (self.processes * 4))
+        
+        for i in range(0, len(layer_paths), chunk_size):
+            chunk = layer_paths[i:i + chunk_size]
+            if self.processes > 0:
+                result = self._pool.apply_async(_scan_layers_in_process, (chunk,))
+            else:
+                result = self._pool.apply_async(self.scan_layers, (chunk,))
+            for index, layer_path in enumerate(chunk):
+                self._pending[layer_path] = (result, index)
+    
+    
+    def get_scan(self, layer_path):
+        pending = self._pending.pop(layer_path, None)
+        if pending is not None:
+            result, index = pending
+            scan = result.get()[index]
+        elif self.load_cached(layer_path):
+            return self._cached.pop(layer_path)
+        else:
+            scan = self.scan_layer(layer_path)
+        self.store_scan(scan)
+        return scan
+    
+    
+    def type_priority_key(self, layer_path, level):
+        """
+        Default priority: sublayers, then references, then payloads. shallowest first
+        """
+        info = self.nodes.get(layer_path, {})
+        return type_priority.get(info.get('type'), len(type_priority)), level
+    
+    
+    def collapse(self, layer_path):
+        """
+        Leave a layer unwalked for now, so it can be expanded later
+        """
+        self.collapsed.add(layer_path)
+        if layer_path in self.nodes:
+            self.nodes[layer_path]['collapsed'] = True
+    
+    
+    def walkStageLayers(self, layer_path, level=1):
+        for event in self.walk_layers(layer_path, level=level):
+            pass
+    
+    
+    def walk_layers(self, layer_path, level=1):
+        """
+        Walk everything below layer_path, one layer at a time off a work queue.
+        Stack use stays flat no matter how deep the dependencies go
+        :return: generator of WalkEvents
+        """
+        queue = WalkQueue(self.walk_order, self.priority_key)
+        queue.extend([layer_path], level)
+        layer_count = 0
+        
+        while queue:
+            if self.cancelled:
+                logger.info('walk cancelled')
+                return
+            
+            if self.budget:
+                self.truncated = self.budget.exceeded(layer_count, len(self.nodes) + len(self.released_nodes))
+                if self.truncated:
+                    # everything found so far is whole, what's left gets collapsed
+                    unwalked = set()
+                    while queue:
+                        unwalked.add(queue.pop()[0])
+                    unwalked -= self.visited_nodes
+                    for remaining in unwalked:
+                        self.collapse(remaining)
+                    logger.warning('walk truncated, hit {}. {} layers left unwalked'.format(
+                        self.truncated, len(unwalked)))
+                    return
+            
+            layer_path, level = queue.pop()
+            id = '-' * (level)
+            
+            # shared layers only get walked once, later arrivals just add edges.
+            # marking the layer before walking it also stops reference loops
+            if layer_path in self.visited_nodes:
+                continue
+            self.visited_nodes.add(layer_path)
+            if layer_path in self.expanded:
+                level = 1
+            if layer_path in self.collapsed:
+                # reached again higher up, or expanded
+                self.collapsed.discard(layer_path)
+                self.nodes.get(layer_path, {}).pop('collapsed', None)
+            
+            scan = self.get_scan(layer_path)
+            layer_count += 1
+            self.memory.sample()
+            events, reached = self.merge_scan(scan)
+            
+            scan_children = set(self.paths.intern(x) for x in scan.children)
+            # out of scope layers never get opened
+            children = [self.paths.intern(x) for x in scan.children]
+            children = [x for x in children if x in reached and x not in self.visited_nodes]
+            if self.max_depth and level >= self.max_depth:
+                # far enough, leave the rest for later.
+                # marked before the events go out, so they get there with the node
+                for child in children:
+                    if child not in self.expanded:
+                        self.collapse(child)
+                children = [x for x in children if x in self.expanded]
+            
+            for event in events:
+                yield event
+                # anything that isn't a layer still to be walked can go straight away
+                if event.kind == LAYER_FINISHED or (event.kind == NODE_FOUND and
+                                                    event.path not in scan_children):
+                    self.release_node(event.path)
+            
+            # get the workers going on everything below this layer
+            # while we carry on with the queue.
+            # merging still happens in walk order, so the graph comes out
+            # the same as a serial walk
+            self.prefetch(children)
+            
+            if children:
+                logger.debug((id, 'dependencies'.center(40, '-')))
+                logger.debug((id, children))
+            queue.extend(children, level + 1)
+
+
+# each worker process gets its own walker to scan with.
+# see DependencyWalker.processes
+_process_walker = None
+
+
+def _init_scan_process(usdfile, settings):
+    global _process_walker
+    _process_walker = DependencyWalker(usdfile)
+    for key, value in settings.items():
+        setattr(_process_walker, key, value)
+    _process_walker.resolver_context = _process_walker.resolver.CreateDefaultContextForAsset(usdfile)
+
+
+def _scan_layers_in_process(layer_paths):
+    return _process_walker.scan_layers(layer_paths)
@@ -0,0 +1,180 @@
+"""
+Watches the files in the graph, and says when some of them have changed
+"""
+import logging
+import os.path
+import threading
+
+from Qt import QtCore
+
+from .layer_cache import file_signature
+from .stat_cache import StatCache
+from . import textures
+
+logger = logging.getLogger('usd-noodle')
+
+
+def path_signature(path):
+    """
+    file_signature, or for a tiled texture path the signatures of every tile on disk,
+    so editing, adding or taking away a tile all count as a change to the texture
+    """
+    tiles = textures.tile_paths(path, StatCache())
+    if tiles is None:
+        return file_signature(path)
+    return tuple((x, file_signature(x)) for x in tiles)
+
+
+class GraphWatcher(QtCore.QObject):
+    """
+    Watches a set of files for changes, and emits files_changed with the ones that did.
+    
+    Directories are watched rather than files, so a few thousand files only use up as many
+    watch handles as there are directories, and publishes that write a temp file and rename
+    it over the old one still get noticed. Past max_watches directories, the rest go without.
+    
+    Every file is also polled with os.stat a batch at a time, watched or not. The watches
+    are only a quicker way to hear about changes, they miss writes from other hosts on nfs.
+    
+    Bursts of changes are collected until things have been quiet for debounce_ms.
+    A file's first signature is taken on a thread of its own, so watching a big graph
+    on a slow disk doesn't hold up the ui.
+    """
+    files_changed = QtCore.Signal(object)  # list of paths
+    
+    
+    def __init__(self, parent=None):
+        super(GraphWatcher, self).__init__(parent)
+        self.max_watches = 256
+        self.debounce_ms = 500
+        self.poll_interval_ms = 2000
+        self.poll_batch = 200
+        
+        # directory -> set of file paths we care about in it
+        self.directories = {}
+        # path -> signature from when we last looked
+        self.signatures = {}
+        # directories that didn't get a watch, and every file, which all get polled
+        self.polled = []
+        self.polled_files = []
+        self._poll_index = 0
+        self.pending = set()
+        
+        self.fs_watcher = QtCore.QFileSystemWatcher(self)
+        self.fs_watcher.directoryChanged.connect(self.on_directory_changed)
+        
+        self.debounce_timer = QtCore.QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.timeout.connect(self.flush)
+        
+        self.poll_timer = QtCore.QTimer(self)
+        self.poll_timer.timeout.connect(self.poll)
+    
+    
+    def watch(self, paths):
+        """
+        Watch these files, and only these files
+        """
+        directories = {}
+        for path in paths:
+            directories.setdefault(os.path.dirname(path), set()).add(path)
+        
+        # keep what we already knew about files that are still around,
+        # so changes that happened while reloading aren't lost
+        all_paths = sorted(x for files in directories.values() for x in files)
+        signatures = dict((x, self.signatures[x]) for x in all_paths if x in self.signatures)
+        new = [x for x in all_paths if x not in signatures]
+        self.signatures = signatures
+        self.directories = directories
+        if new:
+            thread = threading.Thread(target=self.take_signatures, args=(signatures, new))
+            thread.daemon = True
+            thread.start()
+        
+        watched = set(self.fs_watcher.directories())
+        wanted = [x for x in directories if os.path.isdir(x)]
+        # the most crowded directories get the watches
+        wanted.sort(key=lambda x: len(directories[x]), reverse=True)
+        to_watch = set(wanted[:self.max_watches])
+        
+        stale = list(watched - to_watch)
+        if stale:
+            self.fs_watcher.removePaths(stale)
+        new = list(to_watch - watched)
+        if new:
+            self.fs_watcher.addPaths(new)
+        # watches can fail too, the os has its own limits
+        watched = set(self.fs_watcher.directories())
+        
+        self.polled = [x for x in directories if x not in watched]
+        self.polled_files = all_paths
+        self._poll_index = 0
+        if self.polled_files:
+            self.poll_timer.start(self.poll_interval_ms)
+        else:
+            self.poll_timer.stop()
+        
+        logger.info('watching {} files in {} directories, {} directories polled only'.format(
+            len(all_paths), len(watched), len(self.polled)))
+    
+    
+    def stop(self):
+        self.watch([])
+        self.debounce_timer.stop()
+        self.pending = set()
+    
+    
+    def take_signatures(self, signatures, paths):
+        """
+        First signatures for newly watched files, off the ui thread
+        :param signatures: the signatures dict they go in, if it's still the one being used
+        """
+        for path in paths:
+            if signatures is not self.signatures:
+                # watching something else by now
+                return
+            signature = path_signature(path)
+            # check might have got there first
+            signatures.setdefault(path, signature)
+    
+    
+    def check(self, paths):
+        """
+        Stat the files, and queue up any that changed
+        """
+        for path in paths:
+            signature = path_signature(path)
+            if path not in self.signatures:
+                # not looked at yet, this is what it looks like to begin with
+                self.signatures.setdefault(path, signature)
+                continue
+            if signature != self.signatures[path]:
+                self.signatures[path] = signature
+                self.pending.add(path)
+        if self.pending:
+            # restarting the timer is what does the debouncing
+            self.debounce_timer.start(self.debounce_ms)
+    
+    
+    def on_directory_changed(self, directory):
+        self.check(self.directories.get(directory, []))
+    
+    
+    def poll(self):
+        """
+        Check the next batch of files, watched or not
+        """
+        if self._poll_index >= len(self.polled_files):
+            self._poll_index = 0
+        batch = self.polled_files[self._poll_index:self._poll_index + self.poll_batch]
+        self._poll_index += self.poll_batch
+        self.check(batch)
+    
+    
+    def flush(self):
+        if not self.pending:
+            return
+        changed = sorted(self.pending)
+        self.pending = set()
+        logger.info('{} watched files changed'.format(len(changed)))
+        self.files_changed.emit(changed)